@@ -2,6 +2,7 @@
 
 # main.py
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from main_window import RubiksWindow
 
@@ -12,4 +13,7 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
+    # the solver tables are built in worker processes, which needs this in a
+    # frozen executable on Windows
+    multiprocessing.freeze_support()
     main()
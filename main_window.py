@@ -17,10 +17,10 @@ from PyQt5.QtWidgets import QMessageBox
 
 
 def get_tables_path():
-    """Get the path to the tables.json file in the user's home directory"""
+    """Get the path to the solver table file in the user's home directory"""
     home = str(Path.home())
     rubiksolver_dir = os.path.join(home, '.rubiksolver')
-    return os.path.join(rubiksolver_dir, 'tables.json')
+    return os.path.join(rubiksolver_dir, 'tables.bin')
 
 class RubiksWindow(QMainWindow):
     def __init__(self):
@@ -356,7 +356,7 @@ class RubiksWindow(QMainWindow):
         
         exists = os.path.exists(get_tables_path())
         if not exists:
-            self.solution_status.setText("Tables.json does not exist; it will be generated.  Be patient.")
+            self.solution_status.setText("Solver tables do not exist; they will be generated.  Be patient.")
             self.solution_status.setStyleSheet("color: red;")
             QApplication.processEvents()
 
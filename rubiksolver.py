@@ -5,10 +5,10 @@ from pathlib import Path
 import traceback
 
 def get_tables_path():
-    """Get the path to the tables.json file in the user's home directory"""
+    """Get the path to the solver table file in the user's home directory"""
     home = str(Path.home())
     rubiksolver_dir = os.path.join(home, '.rubiksolver')
-    return os.path.join(rubiksolver_dir, 'tables.json')
+    return os.path.join(rubiksolver_dir, 'tables.bin')
 
 
 def get_center_colors(cube_json):
@@ -106,7 +106,7 @@ def solve_cube(cube_state):
 
     exists = os.path.exists(get_tables_path())
     if not exists:
-        print("Tables.json needs generated.  This could take up to a minute so please be patient.")
+        print("Solver tables need generated.  This could take up to a minute so please be patient.")
     kociemba_str = convert_to_kociemba(cube_state)
     print(f"\nKociemba string: {kociemba_str}\n")
     
@@ -0,0 +1,100 @@
+"""
+Check the cubie level code against CubieCube on a seeded set of random
+cubes: the rank and unrank of the permutation coordinates, CompactCube and the
+batched conversion of cube strings to coordinates.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from twophase.cubes import CompactCube, CubieCube, FaceCube
+from twophase.cubes.batch import encode_facelets, facelets_to_coords
+from twophase.cubes.facecube import string_to_cubiecube
+from twophase.cubes.ranks import FACTORIAL, rank_perm, unrank_perm
+from twophase.random import random_cube
+from twophase.solve import SplitSearch
+
+COORDINATES = ("twist", "flip", "udslice", "edge4", "edge8", "corner", "edge")
+
+
+def _random_cubes(n, seed=0):
+    rng = random.Random(seed)
+    return [random_cube(rng) for _ in range(n)]
+
+
+@pytest.mark.parametrize("n", [4, 8, 12])
+def test_rank_unrank_round_trip(n):
+    rng = random.Random(n)
+    ranks = [0, FACTORIAL[n] - 1] + [
+        rng.randrange(FACTORIAL[n]) for _ in range(1000)
+    ]
+    for rank in ranks:
+        perm = unrank_perm(rank, n)
+        assert sorted(perm) == list(range(n))
+        assert rank_perm(perm) == rank
+
+
+def test_compactcube_matches_cubiecube():
+    rng = random.Random(0)
+    for cube_string in _random_cubes(50):
+        cc = string_to_cubiecube(cube_string)
+        compact = CompactCube.from_facecube(FaceCube(cube_string))
+        assert compact.to_cubiecube().to_facecube().to_string() == (
+            cube_string
+        )
+        for _ in range(20):
+            face = rng.randrange(6)
+            cc.move(face)
+            # a quarter turn of the face, as CubieCube.move makes
+            compact.move(3 * face)
+            for name in COORDINATES:
+                assert getattr(compact, name) == getattr(cc, name), name
+        assert (compact.cp, compact.co, compact.ep, compact.eo) == (
+            cc.cp,
+            cc.co,
+            cc.ep,
+            cc.eo,
+        )
+
+
+def test_compactcube_multiply_matches_cubiecube():
+    cubes = _random_cubes(20, seed=1)
+    for a_string, b_string in zip(cubes, cubes[1:]):
+        a = string_to_cubiecube(a_string)
+        b = string_to_cubiecube(b_string)
+        compact = CompactCube.from_cubiecube(a)
+        compact.multiply(CompactCube.from_cubiecube(b))
+        a.multiply(b)
+        assert compact.to_cubiecube().to_facecube().to_string() == (
+            a.to_facecube().to_string()
+        )
+
+
+def _verify(cube_string):
+    search = SplitSearch()
+    search.facelets = cube_string
+    return search.verify()
+
+
+def test_facelets_to_coords_matches_scalar():
+    rng = random.Random(2)
+    cube_strings = []
+    for cube_string in _random_cubes(50, seed=2):
+        cube_strings.append(cube_string)
+        # swap two stickers, which usually breaks the cube
+        i, j = rng.sample(range(54), 2)
+        f = list(cube_string)
+        f[i], f[j] = f[j], f[i]
+        cube_strings.append("".join(f))
+    cube_strings += [cube_strings[0][:53], cube_strings[0] + "U", ""]
+
+    coords, status = facelets_to_coords(encode_facelets(cube_strings))
+    for cube_string, row, code in zip(cube_strings, coords, status):
+        assert code == _verify(cube_string), cube_string
+        if code == 0:
+            cc = string_to_cubiecube(cube_string)
+            expected = [getattr(cc, name) for name in COORDINATES[:6]]
+            assert list(row) == expected, cube_string
+        else:
+            assert np.all(row == -1)
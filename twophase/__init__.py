@@ -1,24 +1,85 @@
 import time
 
-from .solve import SolutionManager
+from .optimal import OptimalSolver
+from .parallel import solve_multi
+from .pool import SolverPool, SolveResult, solve_many
+from .solve import SearchStats, SolutionManager, SolveStatus
 
+# error raised by solve and solve_optimal for each reason the search can stop
+# without a solution
+_STATUS_MESSAGES = {
+    SolveStatus.EXHAUSTED: "no solution found, try increasing max_length",
+    SolveStatus.TIMEOUT: "max_time exceeded, no solution found",
+    SolveStatus.BUDGET: "node_budget exceeded, no solution found",
+    SolveStatus.CANCELLED: "search cancelled, no solution found",
+}
 
-def solve(cube_string, max_length=25, max_time=10):
+
+def _solution_or_raise(solution, method):
+    if isinstance(solution, str):
+        return solution
+    elif solution in _STATUS_MESSAGES:
+        raise RuntimeError(_STATUS_MESSAGES[solution])
+    raise RuntimeError(f"{method}: unexpected return value {solution}")
+
+
+def solve(
+    cube_string,
+    max_length=25,
+    max_time=10,
+    cancel=None,
+    node_budget=None,
+    stats=False,
+):
     """
     Solve the cube specified by cube_string, return the first solution found
-    as long as max_time not exceeded.
+    as long as max_time not exceeded. The search can also be limited by a
+    cancel event and a node budget, see SolutionManager.solve.
+
+    If stats is True, returns the solution along with the SearchStats of the
+    search.
     """
-    sm = SolutionManager(cube_string)
-    solution = sm.solve(max_length, time.time() + max_time)
-    if isinstance(solution, str):
-        return solution
-    elif solution == -2:
-        raise RuntimeError("max_time exceeded, no solution found")
-    elif solution == -1:
-        raise RuntimeError("no solution found, try increasing max_length")
-    raise RuntimeError(
-        f"SolutionManager.solve: unexpected return value {solution}"
+    sm = SolutionManager(cube_string, collect_stats=stats)
+    solution = sm.solve(
+        max_length,
+        time.time() + max_time,
+        cancel=cancel,
+        node_budget=node_budget,
     )
+    solution = _solution_or_raise(solution, "SolutionManager.solve")
+    if stats:
+        return solution, sm.stats
+    return solution
+
+
+def solve_optimal(cube_string, max_length=25, max_time=10, workers=1):
+    """
+    Solve the cube specified by cube_string with as few moves as possible,
+    return the solution as long as max_time not exceeded. Searches with
+    several processes if workers is more than one, see OptimalSolver.
+    """
+    solver = OptimalSolver(cube_string)
+    solution = solver.solve(max_length, time.time() + max_time, workers)
+    return _solution_or_raise(solution, "OptimalSolver.solve")
+
+
+def solve_target(cube_string, target_length, max_length=25, max_time=10):
+    """
+    Solve the cube, improving on the solution found until one of at most
+    target_length moves is found or max_time is exceeded.
+
+    Returns the best solution found and its number of moves. Raises
+    RuntimeError if no solution at all was found.
+    """
+    sm = SolutionManager(cube_string)
+    best = None
+    for best in sm.solutions(
+        max_length, time.time() + max_time, target_length=target_length
+    ):
+        pass
+    if best is None:
+        _solution_or_raise(sm.status, "SolutionManager.solutions")
+    return best, len(best.split())
 
 
 def solve_best(cube_string, max_length=25, max_time=10):
@@ -36,20 +97,8 @@ def solve_best_generator(cube_string, max_length=25, max_time=10):
     Solve the cube repeatedly, reducing max_length each time a solution is
     found until timeout is reached or no more solutions are found.
 
-    Yields the solution each time it is found.
+    Yields the solution each time it is found. The search resumes where it
+    left off after each solution rather than starting again.
     """
     sm = SolutionManager(cube_string)
-    timeout = time.time() + max_time
-    while True:
-        solution = sm.solve(max_length, timeout)
-
-        if isinstance(solution, str):
-            yield solution
-            max_length = len(solution.split(" ")) - 1
-        elif solution == -2 or solution == -1:
-            # timeout or no more solutions
-            break
-        else:
-            raise RuntimeError(
-                f"SolutionManager.solve: unexpected return value {solution}"
-            )
+    yield from sm.solutions(max_length, time.time() + max_time)
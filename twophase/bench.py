@@ -0,0 +1,278 @@
+"""
+Benchmark for the two-phase search.
+
+Solves a seeded corpus of random cubes and cubes a few moves from solved, and
+reports the time taken to load the tables, the time to the first solution and
+to a solution of at most the target length as 50th, 95th and 99th
+percentiles, and how many nodes per second were searched. Run with
+
+    python -m twophase.bench
+
+--save writes the results to a JSON file, and --baseline compares the results
+with a file saved earlier, exiting with status 1 if any latency or the search
+rate is worse than the baseline by more than --tolerance.
+
+With --flipslice-twist or --corner-edge8 the corpus is solved a second time
+with the optional symmetry reduced pruning tables loaded, and the reduction in
+the number of nodes visited is reported.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from .random import random_cube, random_scramble
+from .solve import SolutionManager
+from .tables import LOAD_TIMES, Tables
+
+PERCENTILES = (50, 95, 99)
+
+
+def make_corpus(n, seed=0):
+    """Generate n random cube strings, reproducibly for a given seed."""
+    rng = random.Random(seed)
+    return [random_cube(rng) for _ in range(n)]
+
+
+def make_scrambles(n, length, seed=0):
+    """
+    Generate n cube strings scrambled by length random moves, reproducibly
+    for a given seed.
+    """
+    rng = random.Random(seed)
+    return [random_scramble(length, rng) for _ in range(n)]
+
+
+def percentile(values, p):
+    """
+    The p-th percentile of values, interpolating linearly between the two
+    nearest values.
+    """
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    k = (len(values) - 1) * p / 100
+    i = int(k)
+    if i + 1 == len(values):
+        return values[i]
+    return values[i] + (values[i + 1] - values[i]) * (k - i)
+
+
+def _summary(values):
+    summary = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    summary["mean"] = sum(values) / len(values) if values else float("nan")
+    return summary
+
+
+def search_rate(corpus, max_length=23, max_time=10):
+    """
+    Solve every cube in corpus and return the total number of nodes searched
+    in each phase along with the time taken.
+    """
+    phase_1_nodes = phase_2_nodes = 0
+    elapsed = 0.0
+    for cube_string in corpus:
+        sm = SolutionManager(cube_string)
+        start = time.perf_counter()
+        sm.solve(max_length, time.time() + max_time)
+        elapsed += time.perf_counter() - start
+        phase_1_nodes += sm.phase_1_nodes
+        phase_2_nodes += sm.phase_2_nodes
+    return {
+        "cubes": len(corpus),
+        "phase_1_nodes": phase_1_nodes,
+        "phase_2_nodes": phase_2_nodes,
+        "seconds": elapsed,
+        "nodes_per_second": (phase_1_nodes + phase_2_nodes) / elapsed,
+    }
+
+
+def latencies(corpus, max_length=23, target_length=20, max_time=10):
+    """
+    Solve every cube in corpus, once until the first solution shorter than
+    max_length and once until a solution of at most target_length moves, and
+    summarise the time each took.
+
+    Cubes for which no target length solution was found within max_time
+    count as taking max_time, and are counted in target_missed.
+    """
+    first, target = [], []
+    missed = 0
+    phase_1_nodes = phase_2_nodes = 0
+    elapsed = 0.0
+    for cube_string in corpus:
+        sm = SolutionManager(cube_string)
+        start = time.perf_counter()
+        sm.solve(max_length, time.time() + max_time)
+        first.append(time.perf_counter() - start)
+        elapsed += first[-1]
+        phase_1_nodes += sm.phase_1_nodes
+        phase_2_nodes += sm.phase_2_nodes
+
+        sm = SolutionManager(cube_string)
+        start = time.perf_counter()
+        reached = False
+        for solution in sm.solutions(
+            max_length, time.time() + max_time, target_length=target_length
+        ):
+            reached = len(solution.split()) <= target_length
+        target.append(time.perf_counter() - start)
+        if not reached:
+            target[-1] = max(target[-1], max_time)
+            missed += 1
+    return {
+        "cubes": len(corpus),
+        "first_solution": _summary(first),
+        "target_length": _summary(target),
+        "target_missed": missed,
+        "phase_1_nodes": phase_1_nodes,
+        "phase_2_nodes": phase_2_nodes,
+        "nodes_per_second": (phase_1_nodes + phase_2_nodes) / elapsed,
+    }
+
+
+def compare(result, baseline, tolerance=0.1):
+    """
+    Compare result with a baseline saved from an earlier run, printing the
+    ratio of each measurement to the baseline. Returns the names of the
+    measurements worse than the baseline by more than tolerance.
+    """
+    if result["config"] != baseline.get("config"):
+        print("warning: the baseline was run with different settings")
+    regressions = []
+    for name, corpus in result["corpora"].items():
+        base = baseline["corpora"].get(name)
+        if base is None:
+            continue
+        print(f"\n{name} cubes against baseline")
+        for measure in ("first_solution", "target_length"):
+            for key, value in corpus[measure].items():
+                ratio = value / max(base[measure][key], 1e-9)
+                print(f"  {measure} {key}: {ratio:.2f}x")
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{name} {measure} {key}")
+        ratio = corpus["nodes_per_second"] / base["nodes_per_second"]
+        print(f"  nodes per second: {ratio:.2f}x")
+        if ratio < 1 / (1 + tolerance):
+            regressions.append(f"{name} nodes_per_second")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m twophase.bench", description=__doc__.split("\n")[1]
+    )
+    parser.add_argument("--cubes", type=int, default=20)
+    parser.add_argument(
+        "--shallow",
+        type=int,
+        default=20,
+        help="number of cubes scrambled by --scramble-length moves",
+    )
+    parser.add_argument("--scramble-length", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-length", type=int, default=23)
+    parser.add_argument("--target-length", type=int, default=20)
+    parser.add_argument("--max-time", type=float, default=10)
+    parser.add_argument("--save", metavar="PATH", help="save results as JSON")
+    parser.add_argument(
+        "--baseline", metavar="PATH", help="compare with saved results"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument(
+        "--flipslice-twist",
+        action="store_true",
+        help="compare against the symmetry reduced phase 1 table",
+    )
+    parser.add_argument(
+        "--corner-edge8",
+        action="store_true",
+        help="compare against the symmetry reduced phase 2 table",
+    )
+    args = parser.parse_args(argv)
+
+    Tables()
+    result = {
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "cubes",
+                "shallow",
+                "scramble_length",
+                "seed",
+                "max_length",
+                "target_length",
+                "max_time",
+            )
+        },
+        "table_load_seconds": dict(LOAD_TIMES),
+        "corpora": {},
+    }
+    corpora = {
+        "random": make_corpus(args.cubes, args.seed),
+        "shallow": make_scrambles(
+            args.shallow, args.scramble_length, args.seed
+        ),
+    }
+    for name, corpus in corpora.items():
+        if corpus:
+            result["corpora"][name] = latencies(
+                corpus, args.max_length, args.target_length, args.max_time
+            )
+    _report_latencies(result)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("\nregressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+    if not (args.flipslice_twist or args.corner_edge8):
+        return
+
+    base = search_rate(corpora["random"], args.max_length, args.max_time)
+    print("\nrandom cubes")
+    _report(base)
+    # the optional tables stay loaded once loaded, so they are measured
+    # second
+    Tables(args.flipslice_twist, args.corner_edge8)
+    result = search_rate(corpora["random"], args.max_length, args.max_time)
+    print("\nwith symmetry reduced tables")
+    _report(result)
+    for phase in ("phase_1_nodes", "phase_2_nodes"):
+        reduction = base[phase] / max(result[phase], 1)
+        print(f"{phase.replace('_', ' ')} reduction: {reduction:.2f}x")
+    print(f"speedup: {base['seconds'] / result['seconds']:.2f}x")
+
+
+def _report_latencies(result):
+    for name, seconds in result["table_load_seconds"].items():
+        print(f"load {name}: {seconds * 1000:.1f} ms")
+    for name, corpus in result["corpora"].items():
+        print(f"\n{name} cubes: {corpus['cubes']}")
+        for measure in ("first_solution", "target_length"):
+            times = "  ".join(
+                f"{key} {value * 1000:.1f} ms"
+                for key, value in corpus[measure].items()
+            )
+            print(f"  {measure.replace('_', ' ')}: {times}")
+        print(f"  target length missed: {corpus['target_missed']}")
+        print(f"  nodes per second: {corpus['nodes_per_second']:.0f}")
+
+
+def _report(result):
+    print(f"cubes solved:     {result['cubes']}")
+    print(f"phase 1 nodes:    {result['phase_1_nodes']}")
+    print(f"phase 2 nodes:    {result['phase_2_nodes']}")
+    print(f"search time:      {result['seconds']:.2f} s")
+    print(f"nodes per second: {result['nodes_per_second']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
+from .compactcube import CompactCube
 from .coordcube import CoordCube
 from .cubiecube import CubieCube
 from .facecube import FaceCube
 
-__all__ = ["CoordCube", "CubieCube", "FaceCube"]
+__all__ = ["CompactCube", "CoordCube", "CubieCube", "FaceCube"]
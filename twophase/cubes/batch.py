@@ -0,0 +1,227 @@
+"""
+Batched cubie level operations on NumPy arrays.
+
+Each function here is the vectorised counterpart of one of the coordinate
+properties or setters of CubieCube: it takes a 1-D array of coordinates and
+returns the corresponding orientation or permutation arrays (one row per
+coordinate), or vice versa. The results match the scalar implementations in
+cubiecube exactly, so they can be used to build the move tables in bulk.
+"""
+import numpy as np
+
+from . import facecube, ranks
+from .cubiecube import MOVE_CUBE, CubieCube
+from .ranks import decode_perm, encode_perm
+
+
+def _precompose_moves():
+    """
+    Compute the cubie representation of all 18 moves. Move 3 * i + j is j + 1
+    clockwise quarter turns of face i.
+    """
+    cp, co, ep, eo = [], [], [], []
+    for i in range(6):
+        cube = CubieCube()
+        for j in range(3):
+            cube.multiply(MOVE_CUBE[i])
+            cp.append(cube.cp[:])
+            co.append(cube.co[:])
+            ep.append(cube.ep[:])
+            eo.append(cube.eo[:])
+    return (
+        np.array(cp, dtype=np.int64),
+        np.array(co, dtype=np.int64),
+        np.array(ep, dtype=np.int64),
+        np.array(eo, dtype=np.int64),
+    )
+
+
+# permutations and orientation changes of the 18 moves, indexed by move
+MOVE_CP, MOVE_CO, MOVE_EP, MOVE_EO = _precompose_moves()
+
+
+def move_cp(cp, mv):
+    """
+    Apply move mv to a batch of corner permutations. See
+    CubieCube.corner_multiply for the composition rule.
+    """
+    return cp[:, MOVE_CP[mv]]
+
+
+def move_co(co, mv):
+    """Apply move mv to a batch of corner orientations."""
+    return (co[:, MOVE_CP[mv]] + MOVE_CO[mv]) % 3
+
+
+def move_ep(ep, mv):
+    """
+    Apply move mv to a batch of edge permutations. See
+    CubieCube.edge_multiply for the composition rule.
+    """
+    return ep[:, MOVE_EP[mv]]
+
+
+def move_eo(eo, mv):
+    """Apply move mv to a batch of edge orientations."""
+    return (eo[:, MOVE_EP[mv]] + MOVE_EO[mv]) % 2
+
+
+def encode_twist(co):
+    """Batched CubieCube.twist getter."""
+    return co[:, :7] @ 3 ** np.arange(6, -1, -1, dtype=np.int64)
+
+
+def decode_twist(twist):
+    """Batched CubieCube.twist setter, returns corner orientations."""
+    co = (twist[:, None] // 3 ** np.arange(6, -1, -1, dtype=np.int64)) % 3
+    return np.hstack([co, (-co.sum(axis=1, keepdims=True)) % 3])
+
+
+def encode_flip(eo):
+    """Batched CubieCube.flip getter."""
+    return eo[:, :11] @ 2 ** np.arange(10, -1, -1, dtype=np.int64)
+
+
+def decode_flip(flip):
+    """Batched CubieCube.flip setter, returns edge orientations."""
+    eo = (flip[:, None] // 2 ** np.arange(10, -1, -1, dtype=np.int64)) % 2
+    return np.hstack([eo, (-eo.sum(axis=1, keepdims=True)) % 2])
+
+
+def encode_udslice(ep):
+    """Batched CubieCube.udslice getter."""
+    return ranks.encode_positions(ep >= 8)
+
+
+def decode_udslice(udslice):
+    """
+    Batched CubieCube.udslice setter, returns edge permutations with the
+    slice edges placed in the same order as the scalar setter places them.
+    """
+    n = len(udslice)
+    member = ranks.decode_positions(udslice)
+    ep = np.empty((n, 12), dtype=np.int64)
+    # FR, ..., BR in increasing order of position, then UR, ..., DB
+    ep[member] = np.tile(np.arange(8, 12), n)
+    ep[~member] = np.tile(np.arange(8), n)
+    return ep
+
+
+def encode_edge_positions(ep, edges):
+    """
+    Batched CubieCube._edge_positions, the position and order of the four
+    given edges.
+    """
+    member = np.isin(ep, edges)
+    positions = ranks.encode_positions(member)
+    return 24 * positions + encode_perm(ep[member].reshape(len(ep), 4))
+
+
+def decode_edge_positions(coord, edges):
+    """
+    Batched inverse of encode_edge_positions, returns edge permutations with
+    the four given edges placed as coord specifies and the remaining edges in
+    increasing order.
+    """
+    positions, order = np.divmod(coord, 24)
+    member = ranks.decode_positions(positions)
+    others = [e for e in range(12) if e not in edges]
+    ep = np.empty((len(coord), 12), dtype=np.int64)
+    ep[member] = decode_perm(order, edges).ravel()
+    ep[~member] = np.tile(others, len(coord))
+    return ep
+
+
+_CORNER_FACELETS = np.array(facecube.corner_facelet, dtype=np.int64)
+_EDGE_FACELETS = np.array(facecube.edge_facelet, dtype=np.int64)
+_CORNER_CUBIE = np.array(facecube.CORNER_CUBIE, dtype=np.int64)
+_EDGE_CUBIE = np.array(facecube.EDGE_CUBIE, dtype=np.int64)
+
+
+# row of a string that isn't 54 characters long, which has no colors and so
+# gets status -1 from facelets_to_coords as from SolutionManager.verify
+_NOT_A_CUBE = "?" * 54
+
+
+def encode_facelets(cube_strings):
+    """
+    Convert cube strings to an (N, 54) uint8 array of facelet colors, as
+    indices of Color. Characters that aren't colors become 255, as do all
+    the facelets of strings that aren't exactly 54 characters long.
+    """
+    data = "".join(s if len(s) == 54 else _NOT_A_CUBE for s in cube_strings)
+    codes = data.encode("latin-1", "replace").translate(facecube.COLOR_CODES)
+    return np.frombuffer(codes, dtype=np.uint8).reshape(-1, 54)
+
+
+def _parity(perm):
+    inversions = np.zeros(len(perm), dtype=np.int64)
+    for j in range(1, perm.shape[1]):
+        inversions += (perm[:, :j] > perm[:, j : j + 1]).sum(axis=1)
+    return inversions % 2
+
+
+def facelets_to_coords(facelets):
+    """
+    Batched conversion of facelet colors straight to coordinates, as
+    FaceCube.to_cubiecube followed by CoordCube.from_cubiecube.
+
+    Parameters
+    ----------
+    facelets: numpy.ndarray
+        (N, 54) array of facelet colors as indices of Color, see
+        encode_facelets.
+
+    Returns
+    -------
+    coords: numpy.ndarray
+        (N, 6) array of the coordinates twist, flip, udslice, edge4, edge8
+        and corner of each cube, -1 for cubes that aren't valid.
+    status: numpy.ndarray
+        Validity of each cube, 0 if it is valid and otherwise the error code
+        of SolutionManager.verify: -1 if a color doesn't appear exactly 9
+        times, or one of the codes of CubieCube.verify.
+    """
+    f = np.asarray(facelets, dtype=np.int64)
+    counts = np.stack([(f == c).sum(axis=1) for c in range(6)], axis=1)
+    bad_colors = (counts != 9).any(axis=1)
+    # colors outside 0, ..., 5 make the cube invalid already, keep the
+    # lookups below in range
+    f = np.where((f >= 0) & (f < 6), f, 0)
+
+    corners = f[:, _CORNER_FACELETS]
+    cubie = _CORNER_CUBIE[
+        36 * corners[:, :, 0] + 6 * corners[:, :, 1] + corners[:, :, 2]
+    ]
+    # pieces with unknown colors are left as on the solved cube
+    cp = np.where(cubie >= 0, cubie // 3, np.arange(8))
+    co = np.where(cubie >= 0, cubie % 3, 0)
+    edges = f[:, _EDGE_FACELETS]
+    cubie = _EDGE_CUBIE[6 * edges[:, :, 0] + edges[:, :, 1]]
+    ep = np.where(cubie >= 0, cubie // 2, np.arange(12))
+    eo = np.where(cubie >= 0, cubie % 2, 0)
+
+    # the checks of CubieCube.verify, in order
+    checks = [
+        bad_colors,
+        (np.sort(ep, axis=1) != np.arange(12)).any(axis=1),
+        eo.sum(axis=1) % 2 != 0,
+        (np.sort(cp, axis=1) != np.arange(8)).any(axis=1),
+        co.sum(axis=1) % 3 != 0,
+        _parity(ep) != _parity(cp),
+    ]
+    status = np.select(checks, [-1, -2, -3, -4, -5, -6], 0).astype(np.int8)
+
+    coords = np.stack(
+        [
+            encode_twist(co),
+            encode_flip(eo),
+            encode_udslice(ep),
+            encode_perm(ep[:, 8:]),
+            encode_perm(ep[:, :8]),
+            encode_perm(cp),
+        ],
+        axis=1,
+    )
+    coords[status != 0] = -1
+    return coords, status
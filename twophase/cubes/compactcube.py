@@ -0,0 +1,401 @@
+"""
+A compact cube on the level of the cubies, for code that makes many moves and
+reads coordinates as it goes.
+
+CubieCube stores which piece is at each position, so a move rebuilds all four
+of its lists. CompactCube instead stores where each piece is, as a single
+bytes object of 20 states: one for each corner, 3 * position + orientation,
+followed by one for each edge, 24 + 2 * position + orientation. A move sends
+the piece in each state to a state that depends only on the old one, so it
+is a permutation of the 48 states, and making a move is a single call to
+bytes.translate with the table of the move. The tables of all 18 moves are
+computed once when the module is imported.
+
+Coordinates are computed when they're first read and kept until the cube is
+next changed.
+"""
+from .cubiecube import MOVE_CUBE, CubieCube
+from .ranks import RANK_OF_MASK, rank_perm, unrank_perm
+
+# number of corner states, the edge states follow them
+_EDGE_OFFSET = 24
+
+
+def _pack(cp, co, ep, eo):
+    """State of a cube given as for CubieCube."""
+    state = [0] * 20
+    for i in range(8):
+        state[cp[i]] = 3 * i + co[i]
+    for i in range(12):
+        state[8 + ep[i]] = _EDGE_OFFSET + 2 * i + eo[i]
+    return bytes(state)
+
+
+# orientation of the piece in each state
+_ORI = bytes(
+    [s % 3 for s in range(_EDGE_OFFSET)]
+    + [s % 2 for s in range(_EDGE_OFFSET)]
+    + [0] * (256 - 2 * _EDGE_OFFSET)
+)
+
+
+def _unpack(state):
+    """cp, co, ep, eo of a cube given by its state."""
+    corners, edges = state[:8], state[8:]
+    # the states of the pieces sort in the order of their positions
+    cp = sorted(range(8), key=corners.__getitem__)
+    ep = sorted(range(12), key=edges.__getitem__)
+    co = list(bytes(map(corners.__getitem__, cp)).translate(_ORI))
+    eo = list(bytes(map(edges.__getitem__, ep)).translate(_ORI))
+    return cp, co, ep, eo
+
+
+_IDENTITY = bytes(range(256))
+
+
+def _table(cp, co, ep, eo):
+    """
+    Translation table of the states multiplying by the cube cp, co, ep, eo,
+    see CubieCube.corner_multiply. The piece at position cp[i] moves to
+    position i, adding co[i] to its orientation.
+    """
+    table = bytearray(_IDENTITY)
+    for i in range(8):
+        for ori in range(3):
+            table[3 * cp[i] + ori] = 3 * i + (ori + co[i]) % 3
+    for i in range(12):
+        for ori in range(2):
+            table[_EDGE_OFFSET + 2 * ep[i] + ori] = (
+                _EDGE_OFFSET + 2 * i + (ori + eo[i]) % 2
+            )
+    return bytes(table)
+
+
+def _move_tables():
+    tables = []
+    for face in range(6):
+        cube = CubieCube()
+        for _ in range(3):
+            cube.multiply(MOVE_CUBE[face])
+            tables.append(_table(cube.cp, cube.co, cube.ep, cube.eo))
+    return tuple(tables)
+
+
+# translation table of each of the 18 moves, indexed by 3 * face + power
+MOVE_TABLES = _move_tables()
+
+_SOLVED = _pack(range(8), [0] * 8, range(12), [0] * 12)
+
+# contribution of each corner state to twist and each edge state to flip
+_ORI_WEIGHT = tuple(
+    (s % 3) * 3 ** (6 - s // 3) if s // 3 < 7 else 0
+    for s in range(_EDGE_OFFSET)
+) + tuple(
+    (s % 2) * 2 ** (10 - s // 2) if s // 2 < 11 else 0
+    for s in range(_EDGE_OFFSET)
+)
+
+
+def _twist(state):
+    return sum(map(_ORI_WEIGHT.__getitem__, state[:8]))
+
+
+def _flip(state):
+    return sum(map(_ORI_WEIGHT.__getitem__, state[8:]))
+
+
+def _corner(state):
+    return rank_perm(sorted(range(8), key=state[:8].__getitem__))
+
+
+def _edge(state):
+    return rank_perm(sorted(range(12), key=state[8:].__getitem__))
+
+
+def _edge8(state):
+    return rank_perm(sorted(range(12), key=state[8:].__getitem__)[:8])
+
+
+def _udslice(state):
+    # the positions of the slice edges FR, FL, BL, BR
+    mask = 0
+    for s in state[16:]:
+        mask |= 1 << (s - _EDGE_OFFSET) // 2
+    return RANK_OF_MASK[mask]
+
+
+def _edge4(state):
+    return rank_perm(sorted(range(12), key=state[8:].__getitem__)[8:])
+
+
+class _Coordinate:
+    """
+    Coordinate of a CompactCube, computed from its state by compute when it
+    is first read and cached until the cube is changed. Setting it calls
+    assign(cube, value), which updates the state.
+    """
+
+    def __init__(self, name, compute, assign):
+        self.name = name
+        self.compute = compute
+        self.assign = assign
+        self.__doc__ = f"The {name} coordinate, see CubieCube.{name}."
+
+    def __get__(self, cube, owner=None):
+        if cube is None:
+            return self
+        coords = cube._coords
+        if coords is None:
+            coords = cube._coords = {}
+        try:
+            return coords[self.name]
+        except KeyError:
+            value = coords[self.name] = self.compute(cube._state)
+            return value
+
+    def __set__(self, cube, value):
+        self.assign(cube, value)
+
+
+def _set_orientations(cube, co=None, eo=None):
+    state = cube._state
+    if co is not None:
+        state = bytes(3 * (s // 3) + co[s // 3] for s in state[:8]) + state[8:]
+    if eo is not None:
+        state = state[:8] + bytes(
+            s - s % 2 + eo[(s - _EDGE_OFFSET) // 2] for s in state[8:]
+        )
+    cube._set_state(state)
+
+
+def _set_twist(cube, twist):
+    if not 0 <= twist < 3**7:
+        raise ValueError(
+            f"{twist} is out of range for twist, must take values in "
+            "0, ..., 2186."
+        )
+    co = [0] * 8
+    for i in range(6, -1, -1):
+        twist, co[i] = divmod(twist, 3)
+    co[7] = -sum(co) % 3
+    _set_orientations(cube, co=co)
+
+
+def _set_flip(cube, flip):
+    if not 0 <= flip < 2**11:
+        raise ValueError(
+            f"{flip} is out of range for flip, must take values in "
+            "0, ..., 2047."
+        )
+    eo = [0] * 12
+    for i in range(10, -1, -1):
+        flip, eo[i] = divmod(flip, 2)
+    eo[11] = sum(eo) % 2
+    _set_orientations(cube, eo=eo)
+
+
+def _set_corner(cube, corner):
+    if not 0 <= corner < 40320:
+        raise ValueError(
+            f"{corner} is out of range for corner, must take values in "
+            "0, ..., 40319."
+        )
+    _, co, ep, eo = _unpack(cube._state)
+    cube._set_state(_pack(unrank_perm(corner, 8), co, ep, eo))
+
+
+def _set_edge(cube, edge):
+    if not 0 <= edge < 479001600:
+        raise ValueError(
+            f"{edge} is out of range for edge, must take values in "
+            "0, ..., 479001599."
+        )
+    cp, co, _, eo = _unpack(cube._state)
+    cube._set_state(_pack(cp, co, unrank_perm(edge, 12), eo))
+
+
+def _check_slice(cube, name):
+    # unlike CubieCube, the cube can't hold the same edge twice
+    if sorted(_unpack(cube._state)[2][8:]) != [8, 9, 10, 11]:
+        raise ValueError(
+            f"setting {name} needs the edges FR, FL, BL, BR in the middle "
+            "layer"
+        )
+
+
+def _set_edge8(cube, edge8):
+    if not 0 <= edge8 < 40320:
+        raise ValueError(
+            f"{edge8} is out of range for edge8, must take values in "
+            "0, ..., 40319."
+        )
+    _check_slice(cube, "edge8")
+    cp, co, ep, eo = _unpack(cube._state)
+    cube._set_state(_pack(cp, co, unrank_perm(edge8, 8) + ep[8:], eo))
+
+
+def _set_edge4(cube, edge4):
+    if not 0 <= edge4 < 24:
+        raise ValueError(
+            f"{edge4} is out of range for edge4, must take values in 0-23"
+        )
+    _check_slice(cube, "edge4")
+    cp, co, ep, eo = _unpack(cube._state)
+    perm = [8 + e for e in unrank_perm(edge4, 4)]
+    cube._set_state(_pack(cp, co, ep[:8] + perm, eo))
+
+
+def _set_udslice(cube, udslice):
+    cc = cube.to_cubiecube()
+    cc.udslice = udslice
+    cube._set_state(_pack(cc.cp, cc.co, cc.ep, cc.eo))
+
+
+class CompactCube:
+    """
+    Cube on the level of the cubies, stored compactly so that moves are
+    cheap. See the module docstring for the representation.
+
+    Parameters
+    ----------
+    cp, co, ep, eo: list of int, optional
+        Position of the cube, as for CubieCube. Defaults to the solved cube.
+        Mirrored corners, used by the symmetries of the cube, aren't
+        supported.
+    """
+
+    __slots__ = ("_state", "_coords")
+
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        if not (cp is None or co is None or ep is None or eo is None):
+            self._state = _pack(cp, co, ep, eo)
+        else:
+            self._state = _SOLVED
+        self._coords = None
+
+    @classmethod
+    def from_cubiecube(cls, cube):
+        """Create a CompactCube in the position of a CubieCube."""
+        return cls(cube.cp, cube.co, cube.ep, cube.eo)
+
+    @classmethod
+    def from_facecube(cls, cube):
+        """Create a CompactCube in the position of a FaceCube."""
+        return cls.from_cubiecube(cube.to_cubiecube())
+
+    def to_cubiecube(self):
+        """Convert CompactCube to CubieCube."""
+        return CubieCube(*_unpack(self._state))
+
+    def to_facecube(self):
+        """Convert CompactCube to FaceCube."""
+        return self.to_cubiecube().to_facecube()
+
+    def copy(self):
+        """A copy of the cube, sharing its cached coordinates."""
+        cube = CompactCube.__new__(CompactCube)
+        cube._state = self._state
+        if self._coords is None:
+            cube._coords = None
+        else:
+            cube._coords = dict(self._coords)
+        return cube
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactCube):
+            return NotImplemented
+        return self._state == other._state
+
+    # the cube is mutable
+    __hash__ = None
+
+    def __repr__(self):
+        return "CompactCube({}, {}, {}, {})".format(*_unpack(self._state))
+
+    def _set_state(self, state):
+        self._state = state
+        self._coords = None
+
+    @property
+    def cp(self):
+        """Corner permutation, as CubieCube.cp."""
+        return _unpack(self._state)[0]
+
+    @property
+    def co(self):
+        """Corner orientation, as CubieCube.co."""
+        return _unpack(self._state)[1]
+
+    @property
+    def ep(self):
+        """Edge permutation, as CubieCube.ep."""
+        return _unpack(self._state)[2]
+
+    @property
+    def eo(self):
+        """Edge orientation, as CubieCube.eo."""
+        return _unpack(self._state)[3]
+
+    @property
+    def is_solved(self):
+        """Whether the cube is solved."""
+        return self._state == _SOLVED
+
+    def move(self, mv):
+        """
+        Apply one of the 18 moves, given as 3 * face + power as in the move
+        tables. Note that CubieCube.move takes a face and makes a quarter
+        turn.
+        """
+        self._state = self._state.translate(MOVE_TABLES[mv])
+        self._coords = None
+
+    def moves(self, mvs):
+        """Apply each move of the sequence mvs in turn."""
+        state = self._state
+        for mv in mvs:
+            state = state.translate(MOVE_TABLES[mv])
+        self._set_state(state)
+
+    def corner_multiply(self, b):
+        """
+        Multiply the corners of the cube by those of the cube b, see
+        CubieCube.corner_multiply.
+        """
+        self._multiply(b, edges=False)
+
+    def edge_multiply(self, b):
+        """
+        Multiply the edges of the cube by those of the cube b, see
+        CubieCube.edge_multiply.
+        """
+        self._multiply(b, corners=False)
+
+    def multiply(self, b):
+        """Multiply the cube by the cube b, see CubieCube.multiply."""
+        self._multiply(b)
+
+    def _multiply(self, b, corners=True, edges=True):
+        if isinstance(b, CompactCube):
+            # kept with the coordinates of b for the next multiplication
+            coords = b._coords
+            if coords is None:
+                coords = b._coords = {}
+            table = coords.get("table")
+            if table is None:
+                table = coords["table"] = _table(*_unpack(b._state))
+        else:
+            table = _table(b.cp, b.co, b.ep, b.eo)
+        if not corners:
+            table = _IDENTITY[:_EDGE_OFFSET] + table[_EDGE_OFFSET:]
+        elif not edges:
+            table = table[:_EDGE_OFFSET] + _IDENTITY[_EDGE_OFFSET:]
+        self._set_state(self._state.translate(table))
+
+    twist = _Coordinate("twist", _twist, _set_twist)
+    flip = _Coordinate("flip", _flip, _set_flip)
+    udslice = _Coordinate("udslice", _udslice, _set_udslice)
+    edge4 = _Coordinate("edge4", _edge4, _set_edge4)
+    edge8 = _Coordinate("edge8", _edge8, _set_edge8)
+    corner = _Coordinate("corner", _corner, _set_corner)
+    edge = _Coordinate("edge", _edge, _set_edge)
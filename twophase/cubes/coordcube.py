@@ -47,9 +47,10 @@ class CoordCube:
             respectively, and j = 0, 1, 2 for quarter turn clockwise, half turn
             and quarter turn anticlockwise respectively.
         """
-        self.twist = self.tables.twist_move[self.twist][mv]
-        self.flip = self.tables.flip_move[self.flip][mv]
-        self.udslice = self.tables.udslice_move[self.udslice][mv]
-        self.edge4 = self.tables.edge4_move[self.edge4][mv]
-        self.edge8 = self.tables.edge8_move[self.edge8][mv]
-        self.corner = self.tables.corner_move[self.corner][mv]
+        moves = self.tables.MOVES
+        self.twist = self.tables.twist_move[self.twist * moves + mv]
+        self.flip = self.tables.flip_move[self.flip * moves + mv]
+        self.udslice = self.tables.udslice_move[self.udslice * moves + mv]
+        self.edge4 = self.tables.edge4_move[self.edge4 * moves + mv]
+        self.edge8 = self.tables.edge8_move[self.edge8 * moves + mv]
+        self.corner = self.tables.corner_move[self.corner * moves + mv]
@@ -5,6 +5,7 @@ from functools import reduce
 
 from ..pieces import Corner, Edge
 from . import facecube
+from .ranks import MASK_OF_RANK, RANK_OF_MASK, rank_perm, unrank_perm
 
 
 def choose(n, k):
@@ -293,6 +294,62 @@ class CubieCube:
         self.corner_multiply(b)
         self.edge_multiply(b)
 
+    def corner_multiply_full(self, b):
+        """
+        Compute permutation and orientation of corners after applying
+        permutation represented by b to current cube, where either cube may be
+        a mirror image.
+
+        Parameters
+        ----------
+        b : CubieCube
+            Permutation to apply represented as a CubieCube.
+
+        Notes
+        -----
+        Reflections of the cube, which appear among its symmetries, turn
+        corners into their mirror images. We store the orientation of a
+        mirrored corner as 3, 4 or 5 and combine orientations as follows
+
+        - if neither corner is mirrored, the orientations add mod 3 as in
+          corner_multiply.
+        - if only b is mirrored, the result is mirrored and the orientations
+          add mod 3.
+        - if only the corner of the current cube is mirrored, the result is
+          mirrored and b's orientation is subtracted mod 3.
+        - if both are mirrored, the result is not mirrored and b's
+          orientation is subtracted mod 3.
+        """
+        corner_perm = [self.cp[b.cp[i]] for i in range(8)]
+        corner_ori = [0] * 8
+        for i in range(8):
+            ori_a = self.co[b.cp[i]]
+            ori_b = b.co[i]
+            if ori_a < 3 and ori_b < 3:
+                corner_ori[i] = (ori_a + ori_b) % 3
+            elif ori_a < 3:
+                corner_ori[i] = 3 + (ori_a + ori_b) % 3
+            elif ori_b < 3:
+                corner_ori[i] = 3 + (ori_a - ori_b) % 3
+            else:
+                corner_ori[i] = (ori_a - ori_b) % 3
+        self.co = corner_ori
+        self.cp = corner_perm
+
+    def multiply_full(self, b):
+        """
+        Compute permutation and orientation of edges and corners after applying
+        permutation represented by b to the current cube, where either cube
+        may be a mirror image. See corner_multiply_full.
+
+        Parameters
+        ----------
+        b : CubieCube
+            Permutation to apply represented as a CubieCube
+        """
+        self.corner_multiply_full(b)
+        self.edge_multiply(b)
+
     def move(self, i):
         """
         Helper function for applying one of 6 canonical moves
@@ -455,13 +512,11 @@ class CubieCube:
         Since there are 12 possible positions and we care only about those 4
         edges, udslice takes values in the range 0, ..., 12C4 - 1.
         """
-        udslice, seen = 0, 0
-        for j in range(12):
-            if 8 <= self.ep[j] < 12:
-                seen += 1
-            elif seen >= 1:
-                udslice += choose(j, seen - 1)
-        return udslice
+        mask = 0
+        for j, e in enumerate(self.ep):
+            if e >= 8:
+                mask |= 1 << j
+        return RANK_OF_MASK[mask]
 
     @udslice.setter
     def udslice(self, udslice):
@@ -492,23 +547,13 @@ class CubieCube:
             Edge.DL,
             Edge.DB,
         ]
-        # invalidate edges
-        for i in range(12):
-            self.ep[i] = Edge.DB
-        # we first position the slice edges
-        seen = 3
-        for j in range(11, -1, -1):
-            if udslice - choose(j, seen) < 0:
-                self.ep[j] = udslice_edge[seen]
-                seen -= 1
-            else:
-                udslice -= choose(j, seen)
-        # then the remaining edges
-        x = 0
-        for j in range(12):
-            if self.ep[j] == Edge.DB:
-                self.ep[j] = other_edge[x]
-                x += 1
+        # the slice edges in order of position, then the remaining edges
+        mask = MASK_OF_RANK[udslice]
+        slice_edges, other_edges = iter(udslice_edge), iter(other_edge)
+        self.ep = [
+            next(slice_edges if mask >> j & 1 else other_edges)
+            for j in range(12)
+        ]
 
     # ----------  Phase 2 Coordinates  ---------- #
     @property
@@ -519,15 +564,7 @@ class CubieCube:
         in particular the 4 edges are correctly placed, just perhaps not
         correctly ordered. edge4 takes values in the range 0, ..., 4! - 1 = 23.
         """
-        edge4 = self.ep[8:]
-        ret = 0
-        for j in range(3, 0, -1):
-            s = 0
-            for i in range(j):
-                if edge4[i] > edge4[j]:
-                    s += 1
-            ret = j * (ret + s)
-        return ret
+        return rank_perm(self.ep[8:])
 
     @edge4.setter
     def edge4(self, edge4):
@@ -546,16 +583,7 @@ class CubieCube:
             raise ValueError(
                 f"{edge4} is out of range for edge4, must take values in 0-23"
             )
-        sliceedge = [Edge.FR, Edge.FL, Edge.BL, Edge.BR]
-        coeffs = [0] * 3
-        for i in range(1, 4):
-            coeffs[i - 1] = edge4 % (i + 1)
-            edge4 //= i + 1
-        perm = [0] * 4
-        for i in range(2, -1, -1):
-            perm[i + 1] = sliceedge.pop(i + 1 - coeffs[i])
-        perm[0] = sliceedge[0]
-        self.ep[8:] = perm[:]
+        self.ep[8:] = [Edge.FR + e for e in unrank_perm(edge4, 4)]
 
     @property
     def edge8(self):
@@ -567,14 +595,7 @@ class CubieCube:
         There are 8 possible positions for the 8 edges, so edge8 takes values
         in the range 0, ..., 8! - 1.
         """
-        edge8 = 0
-        for j in range(7, 0, -1):
-            s = 0
-            for i in range(j):
-                if self.ep[i] > self.ep[j]:
-                    s += 1
-            edge8 = j * (edge8 + s)
-        return edge8
+        return rank_perm(self.ep[:8])
 
     @edge8.setter
     def edge8(self, edge8):
@@ -589,16 +610,12 @@ class CubieCube:
             Order of the 8 aforementioned edges encoded as edge8 coordinate.
             Must satisfy 0 <= edge8 < 8!
         """
-        edges = list(range(8))
-        perm = [0] * 8
-        coeffs = [0] * 7
-        for i in range(1, 8):
-            coeffs[i - 1] = edge8 % (i + 1)
-            edge8 //= i + 1
-        for i in range(6, -1, -1):
-            perm[i + 1] = edges.pop(i + 1 - coeffs[i])
-        perm[0] = edges[0]
-        self.ep[:8] = perm[:]
+        if not 0 <= edge8 < 40320:
+            raise ValueError(
+                "{} is out of range for edge8, must take values in "
+                "0, ..., 40319.".format(edge8)
+            )
+        self.ep[:8] = unrank_perm(edge8, 8)
 
     @property
     def corner(self):
@@ -609,14 +626,7 @@ class CubieCube:
         There are 8 possible positions for the 8 corners, so corner takes
         values in the range 0, ..., 8! - 1.
         """
-        c = 0
-        for j in range(7, 0, -1):
-            s = 0
-            for i in range(j):
-                if self.cp[i] > self.cp[j]:
-                    s += 1
-            c = j * (c + s)
-        return c
+        return rank_perm(self.cp)
 
     @corner.setter
     def corner(self, corn):
@@ -630,16 +640,55 @@ class CubieCube:
             Order of the 8 corners encoded as corner coordinate. Must satisfy
             0 <= corner < 8!
         """
-        corners = list(range(8))
-        perm = [0] * 8
-        coeffs = [0] * 7
-        for i in range(1, 8):
-            coeffs[i - 1] = corn % (i + 1)
-            corn //= i + 1
-        for i in range(6, -1, -1):
-            perm[i + 1] = corners.pop(i + 1 - coeffs[i])
-        perm[0] = corners[0]
-        self.cp = perm[:]
+        if not 0 <= corn < 40320:
+            raise ValueError(
+                "{} is out of range for corner, must take values in "
+                "0, ..., 40319.".format(corn)
+            )
+        self.cp = unrank_perm(corn, 8)
+
+    # ----------  Carried Coordinates  ---------- #
+
+    # phase 1 doesn't need these, but following them through phase 1 lets the
+    # phase 2 coordinates be read off without rebuilding the cube
+    def _edge_positions(self, edges):
+        """
+        Compute the coordinate representing position and order of 4 edges.
+        The positions are encoded as for udslice and the order, as seen
+        running through the positions, as for edge4, giving
+        24 * positions + order in the range 0, ..., 12! / 8! - 1.
+        """
+        mask, order = 0, []
+        for j, e in enumerate(self.ep):
+            if e in edges:
+                mask |= 1 << j
+                order.append(e)
+        return 24 * RANK_OF_MASK[mask] + rank_perm(order)
+
+    @property
+    def udslice_sorted(self):
+        """
+        Compute udslice_sorted, the coordinate representing position and
+        order of the 4 edges FR, FL, BL, BR. Equal to 24 * udslice + edge4 in
+        phase 2, when udslice is 0.
+        """
+        return self._edge_positions((Edge.FR, Edge.FL, Edge.BL, Edge.BR))
+
+    @property
+    def u_edges(self):
+        """
+        Compute u_edges, the coordinate representing position and order of
+        the 4 edges UR, UF, UL, UB.
+        """
+        return self._edge_positions((Edge.UR, Edge.UF, Edge.UL, Edge.UB))
+
+    @property
+    def d_edges(self):
+        """
+        Compute d_edges, the coordinate representing position and order of
+        the 4 edges DR, DF, DL, DB.
+        """
+        return self._edge_positions((Edge.DR, Edge.DF, Edge.DL, Edge.DB))
 
     # ---------- Misc. Coordinates ---------- #
 
@@ -654,14 +703,7 @@ class CubieCube:
         There are 12 possible positions for the 12 edges, so edge takes values
         in the range 0, ..., 12! - 1.
         """
-        e = 0
-        for j in range(11, 0, -1):
-            s = 0
-            for i in range(j):
-                if self.ep[i] > self.ep[j]:
-                    s += 1
-            e = j * (e + s)
-        return e
+        return rank_perm(self.ep)
 
     @edge.setter
     def edge(self, edge):
@@ -676,16 +718,12 @@ class CubieCube:
             Order of the 8 aforementioned edges encoded as edge8 coordinate.
             Must satisfy 0 <= edge8 < 8!
         """
-        edges = list(range(12))
-        perm = [0] * 12
-        coeffs = [0] * 11
-        for i in range(1, 12):
-            coeffs[i - 1] = edge % (i + 1)
-            edge //= i + 1
-        for i in range(10, -1, -1):
-            perm[i + 1] = edges.pop(i + 1 - coeffs[i])
-        perm[0] = edges[0]
-        self.ep = perm[:]
+        if not 0 <= edge < 479001600:
+            raise ValueError(
+                "{} is out of range for edge, must take values in "
+                "0, ..., 479001599.".format(edge)
+            )
+        self.ep = unrank_perm(edge, 12)
 
     # ----------  Solvability Check ---------- #
 
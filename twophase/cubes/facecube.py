@@ -1,3 +1,5 @@
+import itertools
+
 from ..pieces import Color, Facelet
 from . import cubiecube
 
@@ -58,15 +60,91 @@ edge_color = (
 )
 
 
+def _corner_cubie(colors):
+    """
+    Piece and orientation of the corner with the given colors, read in the
+    order of corner_facelet, as 3 * piece + orientation, or -1 if there is no
+    such corner.
+    """
+    # all corner names start with U or D, allowing us to find orientation of
+    # any given corner as follows
+    for ori in range(3):
+        if colors[ori] in [Color.U, Color.D]:
+            break
+    color1 = colors[(ori + 1) % 3]
+    color2 = colors[(ori + 2) % 3]
+    for j in range(8):
+        if color1 == corner_color[j][1] and color2 == corner_color[j][2]:
+            return 3 * j + ori
+    return -1
+
+
+def _edge_cubie(colors):
+    """
+    Piece and orientation of the edge with the given colors, read in the
+    order of edge_facelet, as 2 * piece + orientation, or -1 if there is no
+    such edge.
+    """
+    for j in range(12):
+        if colors[0] == edge_color[j][0] and colors[1] == edge_color[j][1]:
+            return 2 * j
+        if colors[0] == edge_color[j][1] and colors[1] == edge_color[j][0]:
+            return 2 * j + 1
+    return -1
+
+
+# _corner_cubie of each of the 6^3 color triples c0, c1, c2 at index
+# 36 * c0 + 6 * c1 + c2, and _edge_cubie of each color pair c0, c1 at index
+# 6 * c0 + c1
+CORNER_CUBIE = tuple(
+    _corner_cubie(colors) for colors in itertools.product(range(6), repeat=3)
+)
+EDGE_CUBIE = tuple(
+    _edge_cubie(colors) for colors in itertools.product(range(6), repeat=2)
+)
+
+# color index of each character of a cube string, 255 for other characters
+COLOR_CODES = bytes(
+    Color[chr(c)] if chr(c) in Color.__members__ else 255 for c in range(256)
+)
+
+
+def _to_cubiecube(f):
+    """
+    CubieCube of the facelet colors f, as FaceCube.to_cubiecube. A corner or
+    edge whose colors don't match any piece is left as on the solved cube.
+    """
+    cp, co, ep, eo = list(range(8)), [0] * 8, list(range(12)), [0] * 12
+    for i, (a, b, c) in enumerate(corner_facelet):
+        cubie = CORNER_CUBIE[36 * f[a] + 6 * f[b] + f[c]]
+        if cubie >= 0:
+            cp[i], co[i] = divmod(cubie, 3)
+    for i, (a, b) in enumerate(edge_facelet):
+        cubie = EDGE_CUBIE[6 * f[a] + f[b]]
+        if cubie >= 0:
+            ep[i], eo[i] = divmod(cubie, 2)
+    return cubiecube.CubieCube(cp, co, ep, eo)
+
+
+def string_to_cubiecube(cube_string):
+    """
+    Convert a cube string straight to a CubieCube, giving the same result as
+    FaceCube(cube_string).to_cubiecube() without building the FaceCube.
+    """
+    f = cube_string[:54].encode("latin-1", "replace").translate(COLOR_CODES)
+    if len(f) < 54 or max(f) > 5:
+        # raise the same error as FaceCube
+        return FaceCube(cube_string).to_cubiecube()
+    return _to_cubiecube(f)
+
+
 class FaceCube:
     def __init__(self, cube_string="".join(c * 9 for c in "URFDLB")):
         """
         Initialise FaceCube from cube_string, if cube_string is not provided we
         initialise a clean cube.
         """
-        self.f = [0] * 54
-        for i in range(54):
-            self.f[i] = Color[cube_string[i]]
+        self.f = [Color[cube_string[i]] for i in range(54)]
 
     def to_string(self):
         """Convert facecube to cubestring"""
@@ -74,38 +152,4 @@ class FaceCube:
 
     def to_cubiecube(self):
         """Convert FaceCube to CubieCube"""
-        cc = cubiecube.CubieCube()
-        for i in range(8):
-            # all corner names start with U or D, allowing us to find
-            # orientation of any given corner as follows
-            for ori in range(3):
-                if self.f[corner_facelet[i][ori]] in [Color.U, Color.D]:
-                    break
-            color1 = self.f[corner_facelet[i][(ori + 1) % 3]]
-            color2 = self.f[corner_facelet[i][(ori + 2) % 3]]
-            for j in range(8):
-                if (
-                    color1 == corner_color[j][1]
-                    and color2 == corner_color[j][2]
-                ):
-                    cc.cp[i] = j
-                    cc.co[i] = ori
-                    break
-
-        for i in range(12):
-            for j in range(12):
-                if (
-                    self.f[edge_facelet[i][0]] == edge_color[j][0]
-                    and self.f[edge_facelet[i][1]] == edge_color[j][1]
-                ):
-                    cc.ep[i] = j
-                    cc.eo[i] = 0
-                    break
-                if (
-                    self.f[edge_facelet[i][0]] == edge_color[j][1]
-                    and self.f[edge_facelet[i][1]] == edge_color[j][0]
-                ):
-                    cc.ep[i] = j
-                    cc.eo[i] = 1
-                    break
-        return cc
+        return _to_cubiecube(self.f)
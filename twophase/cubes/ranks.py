@@ -0,0 +1,159 @@
+"""
+Rank and unrank of the permutation and position coordinates.
+
+The permutation coordinates (corner, edge8, edge4 and edge) are the Lehmer
+code of a permutation, the sum over positions j of j! times the number of
+entries before position j greater than the entry at j. Rather than comparing
+every pair of entries, rank_perm keeps a bit mask of the entries seen so far
+and looks up how many of them are greater. The permutations of 4 and 8
+pieces are unranked by indexing a table of all of them, built the first time
+it's needed.
+
+udslice and the positions part of the carried edge coordinates encode a set
+of 4 of the 12 edge positions. They are converted to and from the 12 bit mask
+of the positions through a pair of tables.
+
+Each function has a scalar version, used by CubieCube and CompactCube, and a
+batched version on NumPy arrays, used by batch and so by table generation.
+"""
+import itertools
+from math import comb, factorial
+
+import numpy as np
+
+FACTORIAL = tuple(factorial(n) for n in range(13))
+
+# number of bits set in each 12 bit mask
+_BIT_COUNT = bytes(bin(mask).count("1") for mask in range(1 << 12))
+
+
+def rank_perm(perm):
+    """
+    Coordinate of a permutation, as computed by the CubieCube.edge4, edge8,
+    corner and edge getters. The entries must be distinct integers below 12;
+    only their relative order matters.
+    """
+    rank = seen = 0
+    for j, p in enumerate(perm):
+        # entry p isn't in seen, so this counts the entries greater than it
+        rank += FACTORIAL[j] * _BIT_COUNT[seen >> p]
+        seen |= 1 << p
+    return rank
+
+
+def encode_perm(perm):
+    """
+    Batched rank_perm, perm holding one permutation per row. The entries of
+    each row must be distinct; only their relative order matters.
+    """
+    rank = np.zeros(len(perm), dtype=np.int64)
+    for j in range(perm.shape[1] - 1, 0, -1):
+        s = (perm[:, :j] > perm[:, j : j + 1]).sum(axis=1)
+        rank = j * (rank + s)
+    return rank
+
+
+def _unrank_perm(rank, n):
+    items = list(range(n))
+    perm = [0] * n
+    coeffs = [0] * (n - 1)
+    for i in range(1, n):
+        coeffs[i - 1] = rank % (i + 1)
+        rank //= i + 1
+    for i in range(n - 2, -1, -1):
+        perm[i + 1] = items.pop(i + 1 - coeffs[i])
+    perm[0] = items[0]
+    return perm
+
+
+# every permutation of range(n) for n in 4 and 8, n bytes each, in order of
+# rank. Built by _perm_table on first use.
+_PERM_TABLES = {}
+
+
+def _perm_table(n):
+    table = _PERM_TABLES.get(n)
+    if table is None:
+        perms = np.fromiter(
+            itertools.chain.from_iterable(itertools.permutations(range(n))),
+            dtype=np.uint8,
+            count=n * factorial(n),
+        ).reshape(-1, n)
+        ordered = np.empty_like(perms)
+        ordered[encode_perm(perms)] = perms
+        table = _PERM_TABLES[n] = ordered.tobytes()
+    return table
+
+
+def unrank_perm(rank, n):
+    """
+    Permutation of range(n) with the given coordinate, as a list. Inverse of
+    rank_perm, as computed by the CubieCube.edge4, edge8, corner and edge
+    setters.
+    """
+    if n == 4 or n == 8:
+        start = n * rank
+        return list(_perm_table(n)[start : start + n])
+    return _unrank_perm(rank, n)
+
+
+def decode_perm(rank, pieces):
+    """
+    Batched inverse of encode_perm, returning a row for each coordinate in
+    the 1-D array rank.
+
+    Parameters
+    ----------
+    rank: numpy.ndarray
+        1-D array of permutation coordinates.
+    pieces: sequence of int
+        The pieces being permuted, in increasing order.
+    """
+    pieces = np.asarray(pieces, dtype=np.int64)
+    k = len(pieces)
+    if k == 4 or k == 8:
+        table = np.frombuffer(_perm_table(k), dtype=np.uint8).reshape(-1, k)
+        return pieces[table[rank]]
+    return pieces[np.array([_unrank_perm(int(r), k) for r in rank])]
+
+
+def _position_tables():
+    rank_of_mask = [-1] * (1 << 12)
+    mask_of_rank = [0] * 495
+    for positions in itertools.combinations(range(12), 4):
+        # as computed by the CubieCube.udslice getter
+        rank, seen = 0, 0
+        for j in range(12):
+            if j in positions:
+                seen += 1
+            elif seen >= 1:
+                rank += comb(j, seen - 1)
+        mask = sum(1 << j for j in positions)
+        rank_of_mask[mask] = rank
+        mask_of_rank[rank] = mask
+    return tuple(rank_of_mask), tuple(mask_of_rank)
+
+
+# udslice coordinate of each 12 bit mask of four edge positions, -1 for masks
+# without exactly four bits set, and the mask of each udslice coordinate
+RANK_OF_MASK, MASK_OF_RANK = _position_tables()
+
+_RANK_OF_MASK = np.array(RANK_OF_MASK, dtype=np.int64)
+_MASK_OF_RANK = np.array(MASK_OF_RANK, dtype=np.int64)
+_BITS = 1 << np.arange(12, dtype=np.int64)
+
+
+def encode_positions(member):
+    """
+    Batched RANK_OF_MASK, from a boolean array with a row of 12 positions for
+    each set of four positions.
+    """
+    return _RANK_OF_MASK[member @ _BITS]
+
+
+def decode_positions(rank):
+    """
+    Batched MASK_OF_RANK, returning a boolean array with a row of 12
+    positions for each coordinate in the 1-D array rank.
+    """
+    return (_MASK_OF_RANK[rank][:, None] & _BITS) != 0
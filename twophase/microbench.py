@@ -0,0 +1,183 @@
+"""
+Micro-benchmarks for the cubie level operations.
+
+Times the cube multiplications, the getters and setters of each coordinate
+and the conversions to and from FaceCube in isolation, for every
+implementation of the cubie level cube in IMPLEMENTATIONS. Run with
+
+    python -m twophase.microbench
+
+and pass --save and --baseline to keep the results and compare a later run
+with them, as for twophase.bench.
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+
+from .cubes import CompactCube, CubieCube, FaceCube
+from .random import random_cube
+
+# the coordinates timed, each has a getter and setter on the cube
+COORDINATES = ("twist", "flip", "udslice", "edge4", "edge8", "corner", "edge")
+
+# implementations of the cubie level cube, each a function converting a
+# FaceCube to that implementation. They need the same methods and properties
+# as CubieCube.
+IMPLEMENTATIONS = {
+    "CubieCube": FaceCube.to_cubiecube,
+    "CompactCube": CompactCube.from_facecube,
+}
+
+# argument of the move method making a quarter turn of R on each
+# implementation, CubieCube.move takes a face and CompactCube.move one of the
+# 18 moves
+R_MOVE = {CubieCube: 1, CompactCube: 3}
+
+
+def benchmarks(from_facecube, seed=0):
+    """
+    The micro-benchmarks for one implementation, as a dict of functions
+    taking no arguments. The cubes they work on are random cubes generated
+    reproducibly for the given seed.
+    """
+    rng = random.Random(seed)
+    facelets = [FaceCube(random_cube(rng)) for _ in range(2)]
+    a, b = (from_facecube(fc) for fc in facelets)
+    # setting edge4 or edge8 assumes the cube is in phase 2
+    phase_2 = CubieCube()
+    phase_2.corner = rng.randrange(40320)
+    phase_2.edge8 = rng.randrange(40320)
+    phase_2.edge4 = rng.randrange(24)
+    c = from_facecube(phase_2.to_facecube())
+    r = R_MOVE[type(a)]
+    tests = {
+        "corner_multiply": lambda: a.corner_multiply(b),
+        "edge_multiply": lambda: a.edge_multiply(b),
+        "multiply": lambda: a.multiply(b),
+        "move": lambda: a.move(r),
+        "to_facecube": b.to_facecube,
+        "from_facecube": lambda: from_facecube(facelets[0]),
+    }
+    for name in COORDINATES:
+        tests[f"get {name}"] = _getter(b, name)
+        cube = c if name in ("edge4", "edge8") else a
+        tests[f"set {name}"] = _setter(cube, name, getattr(b, name))
+    return tests
+
+
+def _getter(cube, name):
+    if hasattr(cube, "_coords"):
+        # time computing the coordinate rather than reading the coordinates
+        # CompactCube caches
+        def get():
+            cube._coords = None
+            return getattr(cube, name)
+
+        return get
+    return lambda: getattr(cube, name)
+
+
+def _setter(cube, name, value):
+    return lambda: setattr(cube, name, value)
+
+
+def run(implementations=None, pattern="", repeat=5, seed=0):
+    """
+    Time the micro-benchmarks whose name contains pattern for each of the
+    named implementations, all of them by default.
+
+    Returns a dict mapping each implementation name to a dict of the best
+    time per call of each benchmark, in seconds.
+    """
+    results = {}
+    for impl in implementations or IMPLEMENTATIONS:
+        results[impl] = {}
+        for name, fn in benchmarks(IMPLEMENTATIONS[impl], seed).items():
+            if pattern not in name:
+                continue
+            timer = timeit.Timer(fn)
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat, number))
+            results[impl][name] = best / number
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Print the ratio of each time in results to the same one in baseline.
+    Returns the names of the benchmarks slower than the baseline by more
+    than tolerance.
+    """
+    regressions = []
+    for impl, times in results.items():
+        for name, seconds in times.items():
+            base = baseline.get(impl, {}).get(name)
+            if base is None:
+                continue
+            ratio = seconds / base
+            print(f"{impl:<12} {name:<18} {ratio:.2f}x")
+            if ratio > 1 + tolerance:
+                regressions.append(f"{impl} {name}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m twophase.microbench",
+        description=__doc__.split("\n")[1],
+    )
+    parser.add_argument(
+        "--impl",
+        action="append",
+        choices=sorted(IMPLEMENTATIONS),
+        help="implementation to time, may be repeated, defaults to all",
+    )
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="only run benchmarks whose name contains this",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="save results as JSON")
+    parser.add_argument(
+        "--baseline", metavar="PATH", help="compare with saved results"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = run(args.impl, args.filter, args.repeat, args.seed)
+    _report(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nagainst baseline")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nregressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+def _report(results):
+    impls = list(results)
+    names = list(dict.fromkeys(n for times in results.values() for n in times))
+    print(f"{'ns per call':<18}" + "".join(f"{i:>14}" for i in impls))
+    for name in names:
+        times = (results[impl].get(name) for impl in impls)
+        print(
+            f"{name:<18}"
+            + "".join(
+                f"{t * 1e9:>14.0f}" if t is not None else f"{'-':>14}"
+                for t in times
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Index of the positions close to solved.
+
+Every position at most a few moves from solved is stored under a 64 bit key
+along with the first move of an optimal solution, in a table sorted by key.
+A position found in the index is solved optimally by looking it up, making
+the stored move and repeating until the cube is solved.
+
+The cube has more than 2^64 positions, so the key is a hash of the corner
+and edge coordinates rather than an exact encoding. A lookup can therefore
+in principle hit the entry of a different position; every solution is
+checked by applying it before it is returned, so a collision only means the
+position is searched for as usual.
+"""
+import numpy as np
+
+from .cubes import batch
+from .cubes.compactcube import CompactCube
+from .cubes.cubiecube import CubieCube
+
+# odd 64 bit multiplier mixing the corner coordinates into the key
+_KEY_MULTIPLIER = 0x9E3779B97F4A7C15
+_KEY_MASK = (1 << 64) - 1
+
+# stored in place of a move for the solved position
+SOLVED = 255
+
+_TWIST, _FLIP = 2187, 2048
+
+
+def position_key(cube):
+    """Key of the position of a CubieCube or CompactCube."""
+    corners = cube.corner * _TWIST + cube.twist
+    edges = cube.edge * _FLIP + cube.flip
+    return (corners * _KEY_MULTIPLIER + edges) & _KEY_MASK
+
+
+def position_keys(cp, co, ep, eo):
+    """Batched position_key, from the cubie level arrays of the positions."""
+    corners = batch.encode_perm(cp) * _TWIST + batch.encode_twist(co)
+    edges = batch.encode_perm(ep) * _FLIP + batch.encode_flip(eo)
+    # uint64 arithmetic wraps around, matching the mask in position_key
+    return corners.astype(np.uint64) * np.uint64(
+        _KEY_MULTIPLIER
+    ) + edges.astype(np.uint64)
+
+
+def _inverse_move(mv):
+    return 3 * (mv // 3) + 2 - mv % 3
+
+
+def make_near_solved(depth):
+    """
+    Breadth first enumeration of the positions at most depth moves from
+    solved.
+
+    Returns
+    -------
+    keys: numpy.ndarray
+        Sorted keys of the positions, uint64.
+    moves: numpy.ndarray
+        First move of an optimal solution of each position, or SOLVED.
+    """
+    chunk = 1 << 16
+    solved = CubieCube()
+    frontier = [
+        np.array([cubies], dtype=np.int8)
+        for cubies in (solved.cp, solved.co, solved.ep, solved.eo)
+    ]
+    keys = [position_keys(*frontier)]
+    moves = [np.array([SOLVED], dtype=np.uint8)]
+    for level in range(depth):
+        seen = np.sort(np.concatenate(keys))
+        new_frontier, new_keys, new_moves = [[] for _ in range(4)], [], []
+        for start in range(0, len(frontier[0]), chunk):
+            cp, co, ep, eo = (a[start : start + chunk] for a in frontier)
+            for mv in range(18):
+                child = (
+                    batch.move_cp(cp, mv),
+                    batch.move_co(co, mv).astype(np.int8),
+                    batch.move_ep(ep, mv),
+                    batch.move_eo(eo, mv).astype(np.int8),
+                )
+                child_keys = position_keys(*child)
+                # drop positions already found at a smaller depth
+                i = np.searchsorted(seen, child_keys)
+                new = seen[np.minimum(i, len(seen) - 1)] != child_keys
+                new_keys.append(child_keys[new])
+                new_moves.append(
+                    np.full(np.count_nonzero(new), _inverse_move(mv), np.uint8)
+                )
+                if level + 1 < depth:
+                    for positions, a in zip(new_frontier, child):
+                        positions.append(a[new])
+        # keep one of the several ways each position is reached
+        level_keys, first = np.unique(
+            np.concatenate(new_keys), return_index=True
+        )
+        keys.append(level_keys)
+        moves.append(np.concatenate(new_moves)[first])
+        if level + 1 < depth:
+            frontier = [np.concatenate(a)[first] for a in new_frontier]
+    keys = np.concatenate(keys)
+    order = np.argsort(keys)
+    return keys[order], np.concatenate(moves)[order]
+
+
+def _index(keys, key):
+    i = int(np.searchsorted(keys, np.uint64(key)))
+    if i < len(keys) and int(keys[i]) == key:
+        return i
+    return -1
+
+
+def find_solution(cube, keys, moves, depth):
+    """
+    Look up an optimal solution of the CubieCube cube in the index given by
+    keys and moves, built by make_near_solved for the given depth. Positions
+    one move further away are found through their neighbours.
+
+    Returns the solution as a list of moves, or None if the position is not
+    within depth + 1 moves of solved.
+    """
+    keys = np.asarray(keys)
+    cube = CompactCube.from_cubiecube(cube)
+    candidates = [([], cube)]
+    if _index(keys, position_key(cube)) < 0:
+        # any neighbour in the index is an optimal first move, as the
+        # neighbours of a position depth + 1 moves away are at least depth
+        # moves away
+        candidates = []
+        for mv in range(18):
+            neighbour = cube.copy()
+            neighbour.move(mv)
+            if _index(keys, position_key(neighbour)) >= 0:
+                candidates.append(([mv], neighbour))
+    for solution, position in candidates:
+        for _ in range(depth + 1):
+            i = _index(keys, position_key(position))
+            if i < 0 or moves[i] == SOLVED:
+                break
+            solution.append(int(moves[i]))
+            position = position.copy()
+            position.move(solution[-1])
+        if position.is_solved:
+            return solution
+    return None
@@ -0,0 +1,307 @@
+"""
+Optimal solver.
+
+Searches for a shortest solution with IDA* over all 18 moves, proving along
+the way that no shorter one exists. The search follows the phase 1
+coordinates of the cube in each of the three orientations given by rotating
+about the URF-DBL diagonal, and bounds the distance to the solved cube by the
+flipslice-twist distance to phase 2 along each of the three axes and by the
+distance to solve the corners. Both pruning tables are symmetry reduced, see
+Tables.load_flipslice_twist_tables and Tables.load_corner_twist_tables.
+
+A random cube needs around 18 moves and takes a very long time to solve
+optimally in Python, so the solver is best suited to positions that are
+known to be fairly close to solved.
+"""
+from .cubes import CubieCube
+from .solve import (
+    CHECK_INTERVAL,
+    PHASE_1_SUCCESSORS,
+    SPLIT_DEPTH,
+    SolveStatus,
+    SplitSearch,
+    moves_to_string,
+)
+from .symmetry import MOVE_CONJ, URF_ROTATIONS, conjugate
+from .tables import Tables
+
+# the position and order of the slice edges, U edges and D edges of the
+# solved cube. Together with the corners and phase 1 coordinates they tell
+# whether a position is solved.
+_SOLVED_EDGES = (
+    CubieCube().udslice_sorted,
+    CubieCube().u_edges,
+    CubieCube().d_edges,
+)
+
+
+class OptimalSolver(SplitSearch):
+    def __init__(self, facelets):
+        """
+        Solver for finding the shortest solutions of a cube.
+
+        Parameters
+        ----------
+        facelets: str
+            Starting position of the cube, as for SolutionManager.
+        """
+        self.tables = Tables(flipslice_twist=True, corner_twist=True)
+        self._set_cube(facelets)
+
+    def solve(
+        self,
+        max_length=25,
+        timeout=float("inf"),
+        workers=1,
+        cancel=None,
+        node_budget=None,
+    ):
+        """
+        Find a shortest solution of the cube.
+
+        Returns the solution, or the SolveStatus giving the reason the search
+        stopped without one. The number of nodes searched is left in the
+        nodes attribute.
+
+        Parameters
+        ----------
+        max_length: int, optional
+            Upper bound for the allowed number of moves.
+        timeout: int or float, optional
+            Time at which to quit searching. Algorithm will quit when
+            ``time.time() > timeout``.
+        workers: int, optional
+            Number of processes to search with. With more than one, each
+            iteration is split into the subtrees below the first SPLIT_DEPTH
+            moves, which are searched concurrently.
+        cancel, node_budget: optional
+            Limits on the search, see SolutionManager.solve. The node budget
+            is checked every CHECK_INTERVAL nodes, so the search can run past
+            it by up to CHECK_INTERVAL nodes before stopping.
+        """
+        self._start(max_length, timeout, cancel, node_budget)
+        for depth in range(self.min_dist[0], max_length):
+            if workers > 1 and depth > SPLIT_DEPTH:
+                return self._solve_parallel(workers, range(depth, max_length))
+            length = self._search(depth)
+            if length >= 0:
+                return moves_to_string(self.moves[:length])
+            elif length != SolveStatus.EXHAUSTED:
+                return length
+        return SolveStatus.EXHAUSTED
+
+    def _start(self, max_length, timeout, cancel=None, node_budget=None):
+        # moves, the phase 1 coordinates in each orientation, the corner
+        # permutation and the lower bound on the distance to the solved cube
+        # after n moves are stored in position n
+        self.moves = [0] * max_length
+        self.twist = [[0] * max_length for _ in URF_ROTATIONS]
+        self.flip = [[0] * max_length for _ in URF_ROTATIONS]
+        self.udslice = [[0] * max_length for _ in URF_ROTATIONS]
+        self.corner = [0] * max_length
+        self.min_dist = [0] * max_length
+        self._successors = [None] * max_length
+        self._set_limits(timeout, cancel, node_budget)
+        # number of nodes visited, for benchmarking
+        self.nodes = 0
+
+        cc = self._cubiecube
+        for axis, s in enumerate(URF_ROTATIONS):
+            conj = conjugate(cc, s)
+            self.twist[axis][0] = conj.twist
+            self.flip[axis][0] = conj.flip
+            self.udslice[axis][0] = conj.udslice
+        self.corner[0] = cc.corner
+        self.min_dist[0] = self._move(0, None)
+
+    def _move(self, n, mv):
+        """
+        Apply move mv to the coordinates after n moves, or recompute the
+        bound after n moves if mv is None. Returns the lower bound on the
+        distance to the solved cube from the new position.
+        """
+        tables = self.tables
+        if mv is not None:
+            self.corner[n + 1] = tables.corner_full_move[
+                self.corner[n] * 18 + mv
+            ]
+            for axis, s in enumerate(URF_ROTATIONS):
+                # X * M conjugated by S is (S X S^-1) * (S M S^-1)
+                mv_s = MOVE_CONJ[s][mv]
+                twist, flip = self.twist[axis], self.flip[axis]
+                udslice = self.udslice[axis]
+                twist[n + 1] = tables.twist_move[twist[n] * 18 + mv_s]
+                flip[n + 1] = tables.flip_move[flip[n] * 18 + mv_s]
+                udslice[n + 1] = tables.udslice_move[udslice[n] * 18 + mv_s]
+            n += 1
+        corner = self.corner[n]
+        dist = tables.corner_twist_prune.probe(
+            tables.corner_classidx[corner],
+            tables.twist_conj[
+                self.twist[0][n] * 16 + tables.corner_sym[corner]
+            ],
+        )
+        for twist, flip, udslice in zip(self.twist, self.flip, self.udslice):
+            flipslice = udslice[n] * Tables.FLIP + flip[n]
+            dist = max(
+                dist,
+                tables.flipslice_twist_prune.probe(
+                    tables.flipslice_classidx[flipslice],
+                    tables.twist_conj[
+                        twist[n] * 16 + tables.flipslice_sym[flipslice]
+                    ],
+                ),
+            )
+        self.min_dist[n] = dist
+        return dist
+
+    def _is_solved(self, length):
+        """
+        Check whether the first length moves solve the cube. The pruning
+        tables only see the corners and the slice each edge is in, so the
+        edge permutation is followed through the moves to make sure.
+        """
+        tables = self.tables
+        cc = self._cubiecube
+        edges = [cc.udslice_sorted, cc.u_edges, cc.d_edges]
+        edge_moves = (
+            tables.udslice_sorted_move,
+            tables.u_edges_move,
+            tables.d_edges_move,
+        )
+        for mv in self.moves[:length]:
+            for i, edge_move in enumerate(edge_moves):
+                edges[i] = edge_move[edges[i] * 18 + mv]
+        return tuple(edges) == _SOLVED_EDGES
+
+    def _search_below(self, n, depth):
+        return self._search(depth, n)
+
+    def _solver_args(self):
+        return (self.facelets,)
+
+    def _counts(self):
+        return self.nodes
+
+    def _add_counts(self, counts):
+        self.nodes += counts
+
+    def _search(self, depth, start=0):
+        """
+        One iteration of IDA*: depth first search for a solution of exactly
+        depth moves. Returns the length of the solution found, or the
+        SolveStatus the search stopped with.
+
+        If start is given the search is restricted to the subtree below the
+        position reached by the first start moves, which must already be set.
+        """
+        status = self._interrupted()
+        if status is not None:
+            return status
+        elif self.min_dist[start] > depth - start:
+            return SolveStatus.EXHAUSTED
+        elif start == depth:
+            if self._is_solved(depth):
+                return depth
+            return SolveStatus.EXHAUSTED
+
+        # bind everything used in the loop to locals. Move tables are flat,
+        # indexed by coordinate * 18 + move, and pruning tables are probed
+        # inline, see PruningTable.
+        tables = self.tables
+        twist_move = tables.twist_move
+        flip_move = tables.flip_move
+        udslice_move = tables.udslice_move
+        corner_move = tables.corner_full_move
+        corner_twist_prune = tables.corner_twist_prune.table
+        corner_classidx = tables.corner_classidx
+        corner_sym = tables.corner_sym
+        flipslice_twist_prune = tables.flipslice_twist_prune.table
+        flipslice_classidx = tables.flipslice_classidx
+        flipslice_sym = tables.flipslice_sym
+        twist_conj = tables.twist_conj
+        n_twist, n_flip = Tables.TWIST, Tables.FLIP
+        axes = tuple(
+            zip(
+                self.twist,
+                self.flip,
+                self.udslice,
+                (MOVE_CONJ[s] for s in URF_ROTATIONS),
+            )
+        )
+        moves, successors = self.moves, self._successors
+        corner, twist = self.corner, self.twist[0]
+        min_dist = self.min_dist
+
+        nodes = 0
+        n = start
+        successors[n] = iter(
+            PHASE_1_SUCCESSORS[moves[n - 1] // 3 if n > 0 else 6]
+        )
+        try:
+            while True:
+                mv = next(successors[n], -1)
+                if mv < 0:
+                    # all moves tried, backtrack
+                    if n == start:
+                        return SolveStatus.EXHAUSTED
+                    n -= 1
+                    continue
+                moves[n] = mv
+                nodes += 1
+                if nodes >= CHECK_INTERVAL:
+                    self.nodes += nodes
+                    nodes = 0
+                    status = self._interrupted()
+                    if status is not None:
+                        return status
+
+                # moves left after this one
+                togo = depth - n - 1
+                # update the corners and the twist, which bound the distance
+                # before any edges are looked at
+                new_corner = corner[n + 1] = corner_move[corner[n] * 18 + mv]
+                new_twist = twist_move[twist[n] * 18 + mv]
+                i = corner_classidx[new_corner] * n_twist + twist_conj[
+                    (new_twist << 4) + corner_sym[new_corner]
+                ]
+                dist = (corner_twist_prune[i >> 1] >> ((i & 1) << 2)) & 15
+                if dist > togo:
+                    continue
+                # then the phase 1 coordinates along each axis, stopping as
+                # soon as one of them bounds the distance beyond the depth
+                for axis_twist, axis_flip, axis_udslice, move_conj in axes:
+                    mv_s = move_conj[mv]
+                    new_twist = axis_twist[n + 1] = twist_move[
+                        axis_twist[n] * 18 + mv_s
+                    ]
+                    new_flip = axis_flip[n + 1] = flip_move[
+                        axis_flip[n] * 18 + mv_s
+                    ]
+                    new_udslice = axis_udslice[n + 1] = udslice_move[
+                        axis_udslice[n] * 18 + mv_s
+                    ]
+                    fs = new_udslice * n_flip + new_flip
+                    i = flipslice_classidx[fs] * n_twist + twist_conj[
+                        (new_twist << 4) + flipslice_sym[fs]
+                    ]
+                    dist_axis = (
+                        flipslice_twist_prune[i >> 1] >> ((i & 1) << 2)
+                    ) & 15
+                    if dist_axis > dist:
+                        dist = dist_axis
+                        if dist > togo:
+                            break
+                if dist > togo:
+                    continue
+                min_dist[n + 1] = dist
+
+                if togo == 0:
+                    if self._is_solved(depth):
+                        return depth
+                else:
+                    # start search from next node
+                    n += 1
+                    successors[n] = iter(PHASE_1_SUCCESSORS[mv // 3])
+        finally:
+            self.nodes += nodes
@@ -0,0 +1,147 @@
+"""
+Search for solutions in several orientations of the cube at once.
+
+The two-phase algorithm first brings the cube into the subgroup generated by
+U, D, R2, F2, L2 and B2, which singles out the U-D axis. Rotating the cube so
+that the R-L or F-B axis takes its place, or solving the inverse position and
+reversing the solution, gives a different search that may find a short
+solution much sooner. solve_multi runs the six searches given by the three
+axes and their inverses in parallel processes, which share a bound on the
+solution length so that each only looks for solutions shorter than the best
+found so far by any of them.
+"""
+import multiprocessing
+import queue
+import time
+
+from .cubes.facecube import string_to_cubiecube
+from .solve import SolutionManager, moves_to_string, string_to_moves
+from .symmetry import INVERSE, MOVE_CONJ, URF_ROTATIONS, conjugate
+from .tables import Tables
+
+# symmetry the cube is conjugated by and whether it is inverted, for each of
+# the six searches
+ORIENTATIONS = tuple(
+    (s, inverse) for inverse in (False, True) for s in URF_ROTATIONS
+)
+
+
+def orient(cube_string, s, inverse):
+    """
+    Cube string of the position S * X * S^-1 for the cube X given by
+    cube_string, or of its inverse if inverse is True.
+    """
+    cube = conjugate(string_to_cubiecube(cube_string), s)
+    if inverse:
+        cube = cube.inverse_cubiecube()
+    return cube.to_facecube().to_string()
+
+
+def unorient(moves, s, inverse):
+    """
+    Map moves solving the position returned by orient back to moves solving
+    the original cube.
+    """
+    if inverse:
+        # the inverse of a solution solves the inverse position
+        moves = [3 * (mv // 3) + 2 - mv % 3 for mv in reversed(moves)]
+    # X * S^-1 M S = S^-1 (S X S^-1 M) S, so S^-1 M S solves X
+    return [MOVE_CONJ[INVERSE[s]][mv] for mv in moves]
+
+
+def _search(
+    optional_tables,
+    cube_string,
+    s,
+    inverse,
+    max_length,
+    timeout,
+    bound,
+    results,
+):
+    """
+    Worker process searching one orientation of the cube, putting each
+    solution found on the results queue, the exception if the search fails,
+    and None when done.
+    """
+    try:
+        Tables.init_worker(optional_tables)
+        sm = SolutionManager(orient(cube_string, s, inverse))
+        for solution in sm.solutions(max_length, timeout, bound):
+            moves = unorient(string_to_moves(solution), s, inverse)
+            results.put(moves_to_string(moves))
+    except Exception as exc:
+        # raised again by solve_multi, rather than looking like a search
+        # that ran out of solutions
+        results.put(exc)
+    finally:
+        results.put(None)
+
+
+def solve_multi(cube_string, max_length=25, max_time=10):
+    """
+    Solve the cube specified by cube_string, searching it in all three axis
+    orientations and as the inverse of each in six processes. Returns the
+    shortest solution found once max_time is exceeded or every search has
+    run out of shorter solutions.
+
+    Solutions are shorter than max_length, and as in solve_best each
+    solution found restricts all six searches to solutions at least two
+    moves shorter. An exception raised in any of the searches is raised
+    again here.
+    """
+    # check the cube is valid and the tables exist before starting workers
+    SolutionManager(cube_string)
+    timeout = time.time() + max_time
+    optional_tables = Tables.optional_tables()
+
+    bound = multiprocessing.Value("i", max_length)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_search,
+            args=(
+                optional_tables,
+                cube_string,
+                s,
+                inverse,
+                max_length,
+                timeout,
+                bound,
+                results,
+            ),
+            daemon=True,
+        )
+        for s, inverse in ORIENTATIONS
+    ]
+    for process in processes:
+        process.start()
+
+    best, running = None, len(processes)
+    try:
+        while running:
+            try:
+                # workers stop by themselves at the timeout, allow them a
+                # moment to report
+                solution = results.get(
+                    timeout=max(timeout - time.time(), 0) + 1
+                )
+            except queue.Empty:
+                break
+            if solution is None:
+                running -= 1
+            elif isinstance(solution, Exception):
+                raise solution
+            elif best is None or len(solution.split()) < len(best.split()):
+                best = solution
+    finally:
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+    if best is not None:
+        return best
+    elif time.time() > timeout:
+        raise RuntimeError("max_time exceeded, no solution found")
+    raise RuntimeError("no solution found, try increasing max_length")
@@ -0,0 +1,139 @@
+"""
+Solve many cubes in a pool of worker processes.
+
+The workers load the tables once when they start and then solve cube after
+cube, so a pool can be kept around and reused for any number of batches.
+The tables are memory mapped from the table files, so every worker shares
+the same pages rather than holding a copy.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .tables import Tables
+
+# result of solving one cube of a batch. index is the position of the cube in
+# the input, and exactly one of solution and error is not None: error holds
+# the exception raised while solving the cube.
+SolveResult = namedtuple(
+    "SolveResult", ["index", "cube_string", "solution", "error"]
+)
+
+
+def _solve_item(index, cube_string, max_length, max_time):
+    # imported here as the package imports this module
+    from . import solve
+
+    try:
+        solution = solve(cube_string, max_length, max_time)
+    except Exception as e:
+        return SolveResult(index, cube_string, None, e)
+    return SolveResult(index, cube_string, solution, None)
+
+
+class SolverPool:
+    """
+    Persistent pool of solver processes.
+
+    Use as a context manager, or call close when done with the pool.
+
+    Parameters
+    ----------
+    workers: int, optional
+        Number of worker processes, defaults to the number of CPUs.
+    segment: str, optional
+        Name of a shared memory segment published with Tables.publish. The
+        workers attach to it rather than mapping the table files.
+    """
+
+    def __init__(self, workers=None, segment=None):
+        self.workers = workers or os.cpu_count() or 1
+        if segment is not None:
+            Tables.attach(segment)
+        else:
+            # make sure the table files exist before the workers map them
+            Tables()
+        optional_tables = Tables.optional_tables()
+        self._pool = ProcessPoolExecutor(
+            self.workers,
+            initializer=Tables.init_worker,
+            initargs=(optional_tables, segment),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut down the worker processes."""
+        self._pool.shutdown(cancel_futures=True)
+
+    def solve_many(
+        self, cube_strings, max_length=25, max_time=10, ordered=True
+    ):
+        """
+        Solve every cube in cube_strings, yielding a SolveResult for each.
+
+        Cubes are taken from cube_strings as the workers become free, so it
+        may be a long or unbounded iterator.
+
+        Parameters
+        ----------
+        cube_strings: iterable of str
+            Cubes to solve.
+        max_length: int, optional
+            Upper bound for the allowed number of moves.
+        max_time: int or float, optional
+            Time limit for each cube, in seconds.
+        ordered: bool, optional
+            Yield results in the order of the input. Otherwise they are
+            yielded as soon as they are ready.
+        """
+        cubes = enumerate(cube_strings)
+        # keep every worker busy while the next result is being consumed
+        window = 2 * self.workers
+        pending, ready = set(), {}
+        next_index = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) + len(ready) < window:
+                try:
+                    index, cube_string = next(cubes)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(
+                    self._pool.submit(
+                        _solve_item, index, cube_string, max_length, max_time
+                    )
+                )
+            if not pending and not ready:
+                return
+
+            if ordered and next_index in ready:
+                yield ready.pop(next_index)
+                next_index += 1
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if ordered:
+                    ready[result.index] = result
+                else:
+                    yield result
+
+
+def solve_many(
+    cube_strings, max_length=25, max_time=10, workers=None, ordered=True
+):
+    """
+    Solve every cube in cube_strings in a pool of worker processes, yielding
+    a SolveResult for each. Cubes that can't be solved give a result holding
+    the error rather than raising it. See SolverPool.solve_many.
+    """
+    with SolverPool(workers) as pool:
+        yield from pool.solve_many(
+            cube_strings, max_length, max_time, ordered
+        )
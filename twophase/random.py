@@ -1,17 +1,48 @@
 import random
 
-from .cubes import cubiecube
+from .cubes import CompactCube, cubiecube
 from .tables import Tables
 
 
-def random_cube():
+def random_cube(rng=random):
+    """
+    Generate a random solvable cube, returned as a cube string.
+
+    Parameters
+    ----------
+    rng: random.Random, optional
+        Source of randomness, pass a seeded random.Random instance for a
+        reproducible sequence of cubes.
+    """
     cc = cubiecube.CubieCube()
-    cc.flip = random.randint(0, Tables.FLIP)
-    cc.twist = random.randint(0, Tables.TWIST)
+    cc.flip = rng.randrange(Tables.FLIP)
+    cc.twist = rng.randrange(Tables.TWIST)
     while True:
-        cc.corner = random.randint(0, Tables.CORNER)
-        cc.edge = random.randint(0, Tables.EDGE)
+        cc.corner = rng.randrange(Tables.CORNER)
+        cc.edge = rng.randrange(Tables.EDGE)
         if cc.edge_parity == cc.corner_parity:
             break
     fc = cc.to_facecube()
     return fc.to_string()
+
+
+def random_scramble(length, rng=random):
+    """
+    Generate a cube scrambled by length random moves from solved, returned as
+    a cube string. No two successive moves turn the same face, but the cube
+    can still end up fewer than length moves from solved.
+
+    Parameters
+    ----------
+    length: int
+        Number of moves in the scramble.
+    rng: random.Random, optional
+        Source of randomness, pass a seeded random.Random instance for a
+        reproducible sequence of cubes.
+    """
+    cube = CompactCube()
+    face = None
+    for _ in range(length):
+        face = rng.choice([f for f in range(6) if f != face])
+        cube.move(3 * face + rng.randrange(3))
+    return cube.to_facecube().to_string()
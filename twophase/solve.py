@@ -1,25 +1,171 @@
+import contextlib
+import multiprocessing
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from enum import IntEnum
 
-from .cubes import CoordCube, FaceCube
+from . import nearsolved
+from .cubes import CoordCube
+from .cubes.facecube import string_to_cubiecube
 from .pieces import Color
-from .tables import Tables
+from .tables import LOAD_TIMES, PHASE_2_MOVES, Tables
 
 
-class SolutionManager:
-    def __init__(self, facelets):
-        """
-        A utility class for managing the search for the solution.
+def _successor_table(moves):
+    """
+    For each axis, the moves (from those given) that may follow a turn of
+    that axis. We don't turn the same face on consecutive moves, and since
+    turns of opposite faces commute, e.g. UD = DU, we impose that the lower
+    index happens first. Entry 6 holds all moves, for use at the root.
+    """
+    return tuple(
+        tuple(mv for mv in moves if prev not in (mv // 3, mv // 3 + 3))
+        for prev in range(6)
+    ) + (tuple(moves),)
 
-        Parameters
-        ----------
-        facelets: str
-            Starting position of the cube. Should be a 54 character string
-            specifying the stickers on each face (in order U R F D L B),
-            reading row by row from the top left hand corner to the bottom
-            right
-        """
-        self.tables = Tables()
 
+PHASE_1_SUCCESSORS = _successor_table(range(18))
+PHASE_2_SUCCESSORS = _successor_table(PHASE_2_MOVES)
+
+# number of moves after which the phase 1 tree is split between workers
+SPLIT_DEPTH = 2
+
+# number of nodes searched between checks of the time limit, node budget and
+# cancellation
+CHECK_INTERVAL = 1024
+
+
+class SolveStatus(IntEnum):
+    """
+    Reason a search stopped without finding a solution. The values are
+    negative so they can't be confused with a solution length, and EXHAUSTED
+    and TIMEOUT keep the values -1 and -2 used before they were named.
+    """
+
+    # there are no solutions within the allowed length
+    EXHAUSTED = -1
+    # the time limit was exceeded
+    TIMEOUT = -2
+    # the node budget was used up
+    BUDGET = -3
+    # the search was cancelled
+    CANCELLED = -4
+
+
+class SearchStats:
+    """
+    Statistics collected by a SolutionManager created with
+    collect_stats=True.
+
+    Attributes
+    ----------
+    phase_1_depth_nodes: list of int
+        Number of nodes visited in phase 1 at each number of moves from the
+        start, over all iterations.
+    phase_2_depth_nodes: list of int
+        Number of nodes visited in phase 2 at each total number of moves,
+        counting the phase 1 moves.
+    phase_1_cutoffs, phase_2_cutoffs: int
+        Number of nodes not searched further because the pruning tables
+        bound their distance beyond the depth of the iteration.
+    phase_2_entries: int
+        Number of phase 1 solutions phase 2 was started from.
+    phase_2_time: float
+        Seconds spent in phase 2, including bringing the coordinates
+        carried through phase 1 up to date on each entry.
+    search_time: float
+        Seconds spent searching, not counting the time a solutions
+        generator spends suspended.
+    table_load_times: dict
+        Seconds taken to load each table file in this process, see
+        tables.LOAD_TIMES.
+    """
+
+    def __init__(self, max_length):
+        self.phase_1_depth_nodes = [0] * (max_length + 1)
+        self.phase_2_depth_nodes = [0] * (max_length + 1)
+        self.phase_1_cutoffs = 0
+        self.phase_2_cutoffs = 0
+        self.phase_2_entries = 0
+        self.phase_2_time = 0.0
+        self.search_time = 0.0
+        self.table_load_times = dict(LOAD_TIMES)
+
+    def merge(self, other):
+        """Add the counts of other, collected by a worker process."""
+        for mine, theirs in (
+            (self.phase_1_depth_nodes, other.phase_1_depth_nodes),
+            (self.phase_2_depth_nodes, other.phase_2_depth_nodes),
+        ):
+            for i, count in enumerate(theirs[: len(mine)]):
+                mine[i] += count
+        self.phase_1_cutoffs += other.phase_1_cutoffs
+        self.phase_2_cutoffs += other.phase_2_cutoffs
+        self.phase_2_entries += other.phase_2_entries
+        self.phase_2_time += other.phase_2_time
+
+    def as_dict(self):
+        """The statistics as a dictionary, for reporting as JSON."""
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"SearchStats({self.as_dict()})"
+
+
+# flag shared by the worker processes of a parallel solve, set once the
+# solution has been found
+_cancelled = None
+
+
+def _init_subtree_worker(optional_tables, cancelled):
+    global _cancelled
+    _cancelled = cancelled
+    Tables.init_worker(optional_tables)
+
+
+def _search_subtree(cls, args, path, depth, max_length, timeout, node_budget):
+    """
+    Search the part of one IDA* iteration below the node reached by the moves
+    in path, in a worker process, with the solver cls(*args). Returns the
+    moves of the solution found or the SolveStatus the search stopped with,
+    EXHAUSTED if another worker found a solution first, along with the node
+    counts of the search, see SplitSearch.
+    """
+    solver = cls(*args)
+    solver._start(max_length, timeout, node_budget=node_budget)
+    solver._cancelled = _cancelled
+    n = solver._follow(path)
+    m = solver._search_below(n, depth)
+    result = solver.moves[:m] if m >= 0 else m
+    return result, solver._counts()
+
+
+class SplitSearch:
+    """
+    Base of the solvers running IDA* from a cube given by its facelets. It
+    validates the cube, checks the limits on the search and splits the
+    iterations between worker processes.
+
+    Subclasses store the moves searched in moves and the number of nodes
+    searched in nodes, and provide
+
+    _start(max_length, timeout, cancel, node_budget)
+        Prepare a search, calling _set_limits.
+    _move(n, mv)
+        Apply move mv to the coordinates after n moves, returning the lower
+        bound on the number of moves the search needs from the new node.
+    _search_below(n, depth)
+        Search the iteration of the given depth below the node reached by
+        the first n moves, returning the length of the solution found or a
+        SolveStatus.
+    _solver_args(), _counts(), _add_counts(counts)
+        The arguments creating the same solver in a worker process, the node
+        counts the worker passes back, and adding them to those of this
+        solver.
+    """
+
+    def _set_cube(self, facelets):
+        """Set the cube to solve, raising ValueError if it isn't valid."""
         self.facelets = facelets.upper()
 
         status = self.verify()
@@ -34,61 +180,419 @@ class SolutionManager:
             }
             raise ValueError("Invalid cube: {}".format(error_message[status]))
 
-    def solve(self, max_length=25, timeout=float("inf")):
+    def verify(self):
+        count = [0] * 6
+        try:
+            for char in self.facelets:
+                count[Color[char]] += 1
+        except (IndexError, ValueError):
+            return -1
+        for i in range(6):
+            if count[i] != 9:
+                return -1
+
+        # kept to initialise the search from, rather than decoding the
+        # facelets again
+        self._cubiecube = string_to_cubiecube(self.facelets)
+
+        return self._cubiecube.verify()
+
+    def _set_limits(self, timeout, cancel, node_budget):
+        self._timeout = timeout
+        self._cancel = cancel
+        self._node_budget = node_budget
+        self._cancelled = None
+
+    def _interrupted(self):
+        """
+        Check the limits on the search. Returns the SolveStatus to stop the
+        search with, or None to carry on. A worker of a parallel solve stops
+        with EXHAUSTED once another worker has found a solution.
+        """
+        if time.time() > self._timeout:
+            return SolveStatus.TIMEOUT
+        elif self._cancel is not None and self._cancel.is_set():
+            return SolveStatus.CANCELLED
+        elif self._node_budget is not None and self.nodes >= self._node_budget:
+            return SolveStatus.BUDGET
+        elif self._cancelled is not None and self._cancelled.value:
+            return SolveStatus.EXHAUSTED
+        return None
+
+    def _solve_parallel(self, workers, depths, deterministic=False):
+        """
+        Run the IDA* iterations of the given depths, splitting each between
+        worker processes. Returns the first solution found, or the
+        SolveStatus the search stopped with. The workers map the same table
+        files, so the tables are shared between them rather than copied.
+        """
+        optional_tables = Tables.optional_tables()
+        cancelled = multiprocessing.Value("b", 0, lock=False)
+        with contextlib.ExitStack() as stack:
+            pool = stack.enter_context(
+                ProcessPoolExecutor(
+                    workers,
+                    initializer=_init_subtree_worker,
+                    initargs=(optional_tables, cancelled),
+                )
+            )
+            # stop the workers and drop the subtrees not yet started before
+            # waiting for the pool to shut down
+            stack.callback(pool.shutdown, cancel_futures=True)
+            stack.callback(setattr, cancelled, "value", 1)
+
+            for depth in depths:
+                status = self._interrupted()
+                if status is not None:
+                    return status
+                node_budget = self._node_budget
+                if node_budget is not None:
+                    node_budget -= self.nodes
+                futures = [
+                    pool.submit(
+                        _search_subtree,
+                        type(self),
+                        self._solver_args(),
+                        path,
+                        depth,
+                        len(self.moves),
+                        self._timeout,
+                        node_budget,
+                    )
+                    for path in self._tasks(depth)
+                ]
+                result = self._first_result(futures, deterministic)
+                if isinstance(result, list):
+                    return moves_to_string(result)
+                elif result != SolveStatus.EXHAUSTED:
+                    return result
+        return SolveStatus.EXHAUSTED
+
+    def _first_result(self, futures, deterministic):
+        """
+        Wait for the subtree searches of one iteration. Returns the first
+        solution found, in the order of futures if deterministic, or the
+        SolveStatus of the first search stopped by a limit, or EXHAUSTED.
+        """
+        pending = set(futures)
+        results = {}
+        for future in futures:
+            while future not in results:
+                # wake up now and then to see if the search was cancelled,
+                # the workers can't see the caller's event
+                done, pending = wait(
+                    pending, timeout=0.1, return_when=FIRST_COMPLETED
+                )
+                if self._cancel is not None and self._cancel.is_set():
+                    return SolveStatus.CANCELLED
+                for f in done:
+                    result, counts = f.result()
+                    self._add_counts(counts)
+                    results[f] = result
+                    if isinstance(result, list):
+                        if not deterministic:
+                            return result
+                    elif result != SolveStatus.EXHAUSTED:
+                        return SolveStatus(result)
+            if isinstance(results[future], list):
+                return results[future]
+        return SolveStatus.EXHAUSTED
+
+    def _tasks(self, depth):
+        """
+        The nodes at which one iteration of IDA* is split, in the order the
+        search visits them, given by the moves reaching them. These are the
+        nodes SPLIT_DEPTH moves from the start that the search descends into,
+        and any nodes before that with a lower bound of 0, such as those
+        reaching phase 2 in the two-phase search.
+        """
+        tasks = []
+        moves = self.moves
+
+        def visit(n):
+            for mv in PHASE_1_SUCCESSORS[moves[n - 1] // 3 if n else 6]:
+                moves[n] = mv
+                dist = self._move(n, mv)
+                if dist == 0 or (n + 1 == SPLIT_DEPTH and dist < depth - n):
+                    tasks.append(moves[: n + 1])
+                elif dist < depth - n:
+                    visit(n + 1)
+
+        visit(0)
+        return tasks
+
+    def _follow(self, path):
+        """
+        Make the moves in path the first moves of the search, returns the
+        number of moves.
+        """
+        for n, mv in enumerate(path):
+            self.moves[n] = mv
+            self._move(n, mv)
+        return len(path)
+
+
+class SolutionManager(SplitSearch):
+    def __init__(self, facelets, collect_stats=False):
+        """
+        A utility class for managing the search for the solution.
+
+        Parameters
+        ----------
+        facelets: str
+            Starting position of the cube. Should be a 54 character string
+            specifying the stickers on each face (in order U R F D L B),
+            reading row by row from the top left hand corner to the bottom
+            right
+        collect_stats: bool, optional
+            Collect statistics of each search in the stats attribute, see
+            SearchStats. Otherwise stats is None.
+        """
+        self.tables = Tables()
+        self.collect_stats = collect_stats
+        self.stats = None
+        self._set_cube(facelets)
+
+    def solve(
+        self,
+        max_length=25,
+        timeout=float("inf"),
+        workers=1,
+        deterministic=False,
+        cancel=None,
+        node_budget=None,
+    ):
         """
         Solve the cube.
 
         This method implements back to back IDA* searches for phase 1 and phase
-        2, returning the result. Can be called multiple times with decreasing
-        max_length to try and find better solutions.
+        2, returning the solution, or the SolveStatus giving the reason the
+        search stopped without one. Can be called multiple times with
+        decreasing max_length to try and find better solutions.
+
+        The time limit, node budget and cancellation are checked every
+        CHECK_INTERVAL nodes. A search limited by a node budget alone stops
+        at the same point on any machine.
 
         Parameters
         ----------
         max_length: int, optional
             Upper bound for the allowed number of moves.
-        max_time: int or float, optional
+        timeout: int or float, optional
             Time at which to quit searching. Algorithm will quit when
-            ``time.time() > max_time``.
+            ``time.time() > timeout``.
+        workers: int, optional
+            Number of processes to search with. With more than one, each
+            iteration of phase 1 is split into the subtrees below the first
+            SPLIT_DEPTH moves, which are searched concurrently.
+        deterministic: bool, optional
+            With several workers, return the solution the search in a single
+            process would find, rather than the first one found by any
+            worker. This waits for the subtrees before the one containing it.
+        cancel: threading.Event, optional
+            Event that another thread can set to stop the search. Any object
+            with an is_set method will do.
+        node_budget: int, optional
+            Number of nodes after which to give up. It is checked along with
+            the other limits, so the search can run past it by about
+            CHECK_INTERVAL nodes in each phase before stopping. With several
+            workers each subtree is given what is left of the budget when it
+            starts, and the total is checked between iterations.
+        """
+        self._start(max_length, timeout, cancel, node_budget)
+        # with nothing to split, phase 2 is searched from the start
+        if (
+            workers > 1
+            and self.min_dist_1[0] > 0
+            and self._near_solved is None
+        ):
+            start = time.perf_counter()
+            self.status = self._solve_parallel(
+                workers,
+                range(self.min_dist_1[0], self._allowed_length),
+                deterministic,
+            )
+            if self.stats is not None:
+                self.stats.search_time += time.perf_counter() - start
+        else:
+            self.status = self._next_solution()
+        return self.status
+
+    def solutions(
+        self,
+        max_length=25,
+        timeout=float("inf"),
+        bound=None,
+        cancel=None,
+        node_budget=None,
+        target_length=None,
+    ):
+        """
+        Generate successively shorter solutions to the cube.
+
+        After each solution is found the search carries on from where it
+        stopped, rather than starting again from scratch, with the bound on
+        the total length tightened. The solutions generated are the same as
+        those found by calling solve repeatedly, each time with max_length
+        one less than the number of moves in the last solution.
+
+        Parameters
+        ----------
+        max_length: int, optional
+            Upper bound for the allowed number of moves.
+        timeout: int or float, optional
+            Time at which to quit searching, the generator stops when
+            ``time.time() > timeout`` or there are no shorter solutions.
+        bound: multiprocessing.Value, optional
+            Bound on the allowed length shared with searches running in other
+            processes. It is lowered as solutions are found, and each time
+            phase 2 is reached the search adopts the bound if it is tighter
+            than its own.
+        cancel, node_budget: optional
+            See solve.
+        target_length: int, optional
+            Stop as soon as a solution of at most target_length moves is
+            found. Each solution then only has to be shorter than the last,
+            rather than two moves shorter, so that no solution within the
+            target is skipped.
+
+        Once the generator stops, the status attribute holds the SolveStatus
+        giving the reason.
         """
+        self._start(max_length, timeout, cancel, node_budget)
+        self._bound = bound
+        while True:
+            solution = self.status = self._next_solution()
+            if not isinstance(solution, str):
+                return
+            yield solution
+            length = len(solution.split())
+            if target_length is not None:
+                if length <= target_length:
+                    return
+                allowed = length
+            else:
+                allowed = length - 1
+            self._allowed_length = allowed
+            if bound is not None:
+                with bound.get_lock():
+                    bound.value = min(bound.value, allowed)
+
+    def _start(self, max_length, timeout, cancel=None, node_budget=None):
         # prepare for phase 1
         self._phase_1_initialise(max_length)
         self._allowed_length = max_length
-        self._timeout = timeout
+        self._set_limits(timeout, cancel, node_budget)
+        self._bound = None
+        # looked up once here, both to decide whether to split the search and
+        # to start it from
+        self._near_solved = self._near_solved_solution()
+        # phase 2 node count at which to next check the limits
+        self._phase_2_check = CHECK_INTERVAL
+        if self.collect_stats:
+            self.stats = SearchStats(max_length)
+        self._search = self._iterative_deepening()
 
-        for depth in range(self._allowed_length):
-            n = self._phase_1_search(0, depth)
-            if n >= 0:
-                # solution found
-                return self._solution_to_string(n)
-            elif n == -2:
-                # time limit exceeded
-                return -2
+    def _next_solution(self):
+        """
+        Resume the search until the next solution is found. Returns the
+        solution, or the SolveStatus the search stopped with.
+        """
+        if self.stats is None:
+            n = next(self._search, SolveStatus.EXHAUSTED)
+        else:
+            start = time.perf_counter()
+            n = next(self._search, SolveStatus.EXHAUSTED)
+            self.stats.search_time += time.perf_counter() - start
+        if n >= 0:
+            return self._solution_to_string(n)
+        return SolveStatus(n)
 
-        # no solution found
-        return -1
+    def _move(self, n, mv):
+        """
+        Apply move mv to the phase 1 coordinates after n moves, returns the
+        lower bound on the distance to phase 2 from the new position.
+        """
+        tables = self.tables
+        self.twist[n + 1] = tables.twist_move[self.twist[n] * 18 + mv]
+        self.flip[n + 1] = tables.flip_move[self.flip[n] * 18 + mv]
+        self.udslice[n + 1] = tables.udslice_move[self.udslice[n] * 18 + mv]
+        self.min_dist_1[n + 1] = self._phase_1_cost(n + 1)
+        return self.min_dist_1[n + 1]
 
-    def verify(self):
-        count = [0] * 6
-        try:
-            for char in self.facelets:
-                count[Color[char]] += 1
-        except (IndexError, ValueError):
-            return -1
-        for i in range(6):
-            if count[i] != 9:
-                return -1
+    @property
+    def nodes(self):
+        """Number of nodes searched in both phases."""
+        return self.phase_1_nodes + self.phase_2_nodes
+
+    def _search_below(self, n, depth):
+        if self.min_dist_1[n] == 0:
+            return self._phase_2_initialise(n)
+        return next(self._phase_1_search(depth, n), SolveStatus.EXHAUSTED)
+
+    def _solver_args(self):
+        return self.facelets, self.collect_stats
+
+    def _counts(self):
+        return self.phase_1_nodes, self.phase_2_nodes, self.stats
 
-        fc = FaceCube(self.facelets)
-        cc = fc.to_cubiecube()
+    def _add_counts(self, counts):
+        phase_1_nodes, phase_2_nodes, stats = counts
+        self.phase_1_nodes += phase_1_nodes
+        self.phase_2_nodes += phase_2_nodes
+        if stats is not None:
+            self.stats.merge(stats)
 
-        return cc.verify()
+    def _iterative_deepening(self):
+        """
+        Run phase 1 IDA* with increasing depth, yielding the length of each
+        solution found, or a SolveStatus before stopping if a limit on the
+        search is reached.
+
+        _allowed_length may be lowered while the generator is suspended. The
+        iterations before the current one have already been searched for
+        solutions shorter than the old bound, so the search stops once the
+        current depth reaches the new bound.
+
+        A cube found in the index of positions close to solved yields the
+        optimal solution stored there instead.
+        """
+        solution = self._near_solved
+        if solution is not None:
+            if len(solution) < self._allowed_length:
+                self.moves[: len(solution)] = solution
+                yield len(solution)
+            # the solution is optimal, there are none shorter
+            return
+
+        depth = 0
+        while depth < self._allowed_length:
+            for n in self._phase_1_search(depth):
+                yield n
+                if n < 0 or depth >= self._allowed_length:
+                    return
+            depth += 1
+
+    def _near_solved_solution(self):
+        """
+        Optimal solution of the cube from the index of positions close to
+        solved, if it is loaded and the cube is close enough. Otherwise
+        returns None.
+        """
+        if self.tables.near_solved_keys is None:
+            return None
+        return nearsolved.find_solution(
+            self._cubiecube,
+            self.tables.near_solved_keys,
+            self.tables.near_solved_moves,
+            Tables.NEAR_SOLVED_DEPTH,
+        )
 
     def _phase_1_initialise(self, max_length):
-        # the lists 'axis' and 'power' will store the nth move (index of face
-        # being turned stored in axis, number of clockwise quarter turns stored
-        # in power). The nth move is stored in position n-1
-        self.axis = [0] * max_length
-        self.power = [0] * max_length
+        # the list 'moves' stores the nth move in position n-1. A move is
+        # encoded as 3 * i + j where i = 0, ..., 5 is the index of the face
+        # being turned and j + 1 is the number of clockwise quarter turns
+        self.moves = [0] * max_length
 
         # the lists twist, flip and udslice store the phase 1 coordinates after
         # n moves. position 0 stores the inital states, the coordinates after n
@@ -103,6 +607,17 @@ class SolutionManager:
         self.edge4 = [0] * max_length
         self.edge8 = [0] * max_length
 
+        # the position and order of the slice edges, U edges and D edges
+        # after n moves. Together with corner these are brought up to date
+        # with the phase 1 moves only when phase 2 is reached, see
+        # _phase_2_initialise. _carried_moves holds the moves they were last
+        # computed for, and they are valid up to position _carried
+        self.udslice_sorted = [0] * max_length
+        self.u_edges = [0] * max_length
+        self.d_edges = [0] * max_length
+        self._carried_moves = [-1] * max_length
+        self._carried = 0
+
         # the following two arrays store minimum number of moves required to
         # reach phase 2 or a solution respectively
         # after n moves. these estimates come from the pruning tables and are
@@ -110,43 +625,120 @@ class SolutionManager:
         self.min_dist_1 = [0] * max_length
         self.min_dist_2 = [0] * max_length
 
+        # explicit stack for the depth first searches, position n holds an
+        # iterator over the moves still to be tried after n moves
+        self._successors = [None] * max_length
+
+        # number of nodes visited in each phase, for benchmarking
+        self.phase_1_nodes = 0
+        self.phase_2_nodes = 0
+
         # initialise the arrays from the input
-        self.f = FaceCube(self.facelets)
-        self.c = CoordCube.from_cubiecube(self.f.to_cubiecube())
+        cc = self._cubiecube
+        self.c = CoordCube.from_cubiecube(cc)
         self.twist[0] = self.c.twist
         self.flip[0] = self.c.flip
         self.udslice[0] = self.c.udslice
         self.corner[0] = self.c.corner
         self.edge4[0] = self.c.edge4
         self.edge8[0] = self.c.edge8
+        self.udslice_sorted[0] = cc.udslice_sorted
+        self.u_edges[0] = cc.u_edges
+        self.d_edges[0] = cc.d_edges
         self.min_dist_1[0] = self._phase_1_cost(0)
 
     def _phase_2_initialise(self, n):
-        if time.time() > self._timeout:
-            return -2
-        # initialise phase 2 search from the phase 1 solution
-        cc = self.f.to_cubiecube()
-        for i in range(n):
-            for j in range(self.power[i]):
-                cc.move(self.axis[i])
-        self.edge4[n] = cc.edge4
-        self.edge8[n] = cc.edge8
-        self.corner[n] = cc.corner
+        """
+        Search phase 2 from the position reached after n phase 1 moves.
+        Returns the length of the solution found, EXHAUSTED if there is none
+        within the allowed length or the SolveStatus the search stopped with.
+        """
+        stats = self.stats
+        if stats is None:
+            return self._phase_2_start(n)
+        start = time.perf_counter()
+        try:
+            return self._phase_2_start(n)
+        finally:
+            stats.phase_2_entries += 1
+            stats.phase_2_time += time.perf_counter() - start
+
+    def _phase_2_start(self, n):
+        status = self._phase_2_interrupted()
+        if status is not None:
+            return status
+        bound = self._bound
+        if bound is not None and bound.value < self._allowed_length:
+            self._allowed_length = bound.value
+        # initialise phase 2 search from the phase 1 solution. The carried
+        # coordinates are still valid for the moves shared with the previous
+        # phase 1 solution, and only need updating for the rest
+        moves, carried_moves = self.moves, self._carried_moves
+        start = 0
+        while start < min(n, self._carried) and (
+            carried_moves[start] == moves[start]
+        ):
+            start += 1
+        corner_move = self.tables.corner_full_move
+        udslice_sorted_move = self.tables.udslice_sorted_move
+        u_edges_move = self.tables.u_edges_move
+        d_edges_move = self.tables.d_edges_move
+        corner, udslice_sorted = self.corner, self.udslice_sorted
+        u_edges, d_edges = self.u_edges, self.d_edges
+        for i in range(start, n):
+            mv = carried_moves[i] = moves[i]
+            corner[i + 1] = corner_move[corner[i] * 18 + mv]
+            udslice_sorted[i + 1] = udslice_sorted_move[
+                udslice_sorted[i] * 18 + mv
+            ]
+            u_edges[i + 1] = u_edges_move[u_edges[i] * 18 + mv]
+            d_edges[i + 1] = d_edges_move[d_edges[i] * 18 + mv]
+        # the phase 2 search overwrites corner beyond position n
+        self._carried = n
+
+        # in phase 2 the slice edges are in the slice, so udslice_sorted is
+        # just edge4
+        self.edge4[n] = udslice_sorted[n]
+        self.edge8[n] = self.tables.ud_edges_edge8[
+            u_edges[n] * 24 + d_edges[n] % 24
+        ]
         self.min_dist_2[n] = self._phase_2_cost(n)
         for depth in range(self._allowed_length - n):
+            status = self._phase_2_interrupted()
+            if status is not None:
+                return status
             m = self._phase_2_search(n, depth)
             if m >= 0:
                 return m
-        return -1
+        return SolveStatus.EXHAUSTED
+
+    def _phase_2_interrupted(self):
+        """
+        Check the limits on the search once every CHECK_INTERVAL phase 2
+        nodes, see _interrupted.
+        """
+        if self.phase_2_nodes < self._phase_2_check:
+            return None
+        self._phase_2_check = self.phase_2_nodes + CHECK_INTERVAL
+        return self._interrupted()
 
     def _phase_1_cost(self, n):
         """
         Cost of current position for use in phase 1. Returns a lower bound on
         the number of moves requires to get to phase 2.
         """
+        udslice = self.udslice[n]
+        if self.tables.flipslice_twist_prune is not None:
+            flipslice = udslice * Tables.FLIP + self.flip[n]
+            return self.tables.flipslice_twist_prune.probe(
+                self.tables.flipslice_classidx[flipslice],
+                self.tables.twist_conj[
+                    self.twist[n] * 16 + self.tables.flipslice_sym[flipslice]
+                ],
+            )
         return max(
-            self.tables.udslice_twist_prune[self.udslice[n], self.twist[n]],
-            self.tables.udslice_flip_prune[self.udslice[n], self.flip[n]],
+            self.tables.udslice_twist_prune.probe(udslice, self.twist[n]),
+            self.tables.udslice_flip_prune.probe(udslice, self.flip[n]),
         )
 
     def _phase_2_cost(self, n):
@@ -154,83 +746,234 @@ class SolutionManager:
         Cost of current position for use in phase 2. Returns a lower bound on
         the number of moves required to get to a solved cube.
         """
-        return max(
-            self.tables.edge4_corner_prune[self.edge4[n], self.corner[n]],
-            self.tables.edge4_edge8_prune[self.edge4[n], self.edge8[n]],
+        edge4 = self.edge4[n]
+        cost = max(
+            self.tables.edge4_corner_prune.probe(edge4, self.corner[n]),
+            self.tables.edge4_edge8_prune.probe(edge4, self.edge8[n]),
         )
+        if self.tables.corner_edge8_prune is not None:
+            corner = self.corner[n]
+            cost = max(
+                cost,
+                self.tables.corner_edge8_prune.probe(
+                    self.tables.corner_classidx[corner],
+                    self.tables.edge8_conj[
+                        self.edge8[n] * 16 + self.tables.corner_sym[corner]
+                    ],
+                ),
+            )
+        return cost
 
-    def _phase_1_search(self, n, depth):
-        if time.time() > self._timeout:
-            return -2
-        elif self.min_dist_1[n] == 0:
-            return self._phase_2_initialise(n)
-        elif self.min_dist_1[n] <= depth:
-            for i in range(6):
-                if n > 0 and self.axis[n - 1] in (i, i + 3):
-                    # don't turn the same face on consecutive moves
-                    # also for opposite faces, e.g. U and D, UD = DU, so we can
-                    # impose that the lower index happens first.
+    def _phase_1_search(self, depth, start=0):
+        """
+        One iteration of IDA* in phase 1: depth first search of the positions
+        at most depth moves from the start, calling phase 2 on every position
+        that reaches phase 2. Generator yielding the length of each solution
+        found, the search resumes from the same position when it is next
+        called. Yields the SolveStatus and stops if a limit on the search is
+        reached.
+
+        If start is given the search is restricted to the subtree below the
+        position reached by the first start moves, which must already be set.
+        """
+        status = self._interrupted()
+        if status is not None:
+            if status != SolveStatus.EXHAUSTED:
+                yield status
+            return
+        elif start == 0 and self.min_dist_1[0] == 0:
+            m = self._phase_2_initialise(0)
+            if m != -1:
+                yield m
+            return
+        elif start == 0 and self.min_dist_1[0] > depth:
+            return
+
+        # bind everything used in the loop to locals. Move tables are flat,
+        # indexed by coordinate * 18 + move, and pruning tables are probed
+        # inline, see PruningTable.
+        twist_move = self.tables.twist_move
+        flip_move = self.tables.flip_move
+        udslice_move = self.tables.udslice_move
+        udslice_twist_prune = self.tables.udslice_twist_prune.table
+        udslice_flip_prune = self.tables.udslice_flip_prune.table
+        # the symmetry reduced table, if loaded, bounds the distance at least
+        # as well as both of the others, see Tables.load_flipslice_twist_tables
+        flipslice_twist = self.tables.flipslice_twist_prune is not None
+        if flipslice_twist:
+            flipslice_twist_prune = self.tables.flipslice_twist_prune.table
+            flipslice_classidx = self.tables.flipslice_classidx
+            flipslice_sym = self.tables.flipslice_sym
+            twist_conj = self.tables.twist_conj
+        n_twist, n_flip = Tables.TWIST, Tables.FLIP
+        moves, successors = self.moves, self._successors
+        twist, flip, udslice = self.twist, self.flip, self.udslice
+        min_dist_1 = self.min_dist_1
+        stats = self.stats
+        depth_nodes = None if stats is None else stats.phase_1_depth_nodes
+
+        nodes = cutoffs = 0
+        n = start
+        successors[n] = iter(
+            PHASE_1_SUCCESSORS[moves[n - 1] // 3 if n > 0 else 6]
+        )
+        try:
+            while True:
+                mv = next(successors[n], -1)
+                if mv < 0:
+                    # all moves tried, backtrack
+                    if n == start:
+                        return
+                    n -= 1
                     continue
-                for j in range(1, 4):
-                    self.axis[n] = i
-                    self.power[n] = j
-                    mv = 3 * i + j - 1
-
-                    # update coordinates
-                    self.twist[n + 1] = self.tables.twist_move[self.twist[n]][
-                        mv
+                moves[n] = mv
+
+                # update coordinates
+                new_twist = twist[n + 1] = twist_move[twist[n] * 18 + mv]
+                new_flip = flip[n + 1] = flip_move[flip[n] * 18 + mv]
+                new_udslice = udslice[n + 1] = udslice_move[
+                    udslice[n] * 18 + mv
+                ]
+                if flipslice_twist:
+                    fs = new_udslice * n_flip + new_flip
+                    i = flipslice_classidx[fs] * n_twist + twist_conj[
+                        (new_twist << 4) + flipslice_sym[fs]
                     ]
-                    self.flip[n + 1] = self.tables.flip_move[self.flip[n]][mv]
-                    self.udslice[n + 1] = self.tables.udslice_move[
-                        self.udslice[n]
-                    ][mv]
-                    self.min_dist_1[n + 1] = self._phase_1_cost(n + 1)
+                    dist = (
+                        flipslice_twist_prune[i >> 1] >> ((i & 1) << 2)
+                    ) & 15
+                else:
+                    i = new_udslice * n_twist + new_twist
+                    dist = (udslice_twist_prune[i >> 1] >> ((i & 1) << 2)) & 15
+                    i = new_udslice * n_flip + new_flip
+                    dist_flip = (
+                        udslice_flip_prune[i >> 1] >> ((i & 1) << 2)
+                    ) & 15
+                    if dist_flip > dist:
+                        dist = dist_flip
+                min_dist_1[n + 1] = dist
+                nodes += 1
+                if depth_nodes is not None:
+                    depth_nodes[n + 1] += 1
 
-                    # start search from next node
-                    m = self._phase_1_search(n + 1, depth - 1)
+                if nodes >= CHECK_INTERVAL:
+                    self.phase_1_nodes += nodes
+                    nodes = 0
+                    status = self._interrupted()
+                    if status is not None:
+                        # EXHAUSTED means another worker of a parallel solve
+                        # has finished
+                        if status != SolveStatus.EXHAUSTED:
+                            yield status
+                        return
+
+                if dist == 0:
+                    m = self._phase_2_initialise(n + 1)
                     if m >= 0:
-                        return m
-                    if m == -2:
-                        # time limit exceeded
-                        return -2
-        # if no solution found at current depth, return -1
-        return -1
-
-    def _phase_2_search(self, n, depth):
-        if self.min_dist_2[n] == 0:
-            return n
-        elif self.min_dist_2[n] <= depth:
-            for i in range(6):
-                if n > 0 and self.axis[n - 1] in (i, i + 3):
+                        # the caller reads the node count while suspended
+                        self.phase_1_nodes += nodes
+                        nodes = 0
+                        yield m
+                    elif m != SolveStatus.EXHAUSTED:
+                        yield m
+                        return
+                elif dist < depth - n:
+                    # start search from next node
+                    n += 1
+                    successors[n] = iter(PHASE_1_SUCCESSORS[mv // 3])
+                elif depth_nodes is not None:
+                    cutoffs += 1
+        finally:
+            self.phase_1_nodes += nodes
+            if stats is not None:
+                stats.phase_1_cutoffs += cutoffs
+
+    def _phase_2_search(self, start, depth):
+        """
+        One iteration of IDA* in phase 2: depth first search of the positions
+        at most depth moves from the position reached after start moves.
+        Returns the length of the solution found or -1 if there is none.
+        """
+        if self.min_dist_2[start] == 0:
+            return start
+        elif self.min_dist_2[start] > depth:
+            return -1
+
+        # bind everything used in the loop to locals
+        edge4_move = self.tables.edge4_move
+        edge8_move = self.tables.edge8_move
+        corner_move = self.tables.corner_move
+        edge4_corner_prune = self.tables.edge4_corner_prune.table
+        edge4_edge8_prune = self.tables.edge4_edge8_prune.table
+        # the symmetry reduced table, if loaded, is used alongside the others,
+        # see Tables.load_corner_edge8_tables
+        corner_edge8 = self.tables.corner_edge8_prune is not None
+        if corner_edge8:
+            corner_edge8_prune = self.tables.corner_edge8_prune.table
+            corner_classidx = self.tables.corner_classidx
+            corner_sym = self.tables.corner_sym
+            edge8_conj = self.tables.edge8_conj
+        n_corner, n_edge8 = Tables.CORNER, Tables.EDGE8
+        moves, successors = self.moves, self._successors
+        edge4, edge8, corner = self.edge4, self.edge8, self.corner
+        min_dist_2 = self.min_dist_2
+        # depth at which the search stops, counted from the start of phase 1
+        end = start + depth
+        stats = self.stats
+        depth_nodes = None if stats is None else stats.phase_2_depth_nodes
+
+        nodes = cutoffs = 0
+        n = start
+        successors[n] = iter(
+            PHASE_2_SUCCESSORS[moves[n - 1] // 3 if n > 0 else 6]
+        )
+        try:
+            while True:
+                mv = next(successors[n], -1)
+                if mv < 0:
+                    # all moves tried, backtrack
+                    if n == start:
+                        return -1
+                    n -= 1
                     continue
-                for j in range(1, 4):
-                    if i in [1, 2, 4, 5] and j != 2:
-                        # in phase two we only allow half turns of the faces
-                        # R, F, L, B
-                        continue
-                    self.axis[n] = i
-                    self.power[n] = j
-                    mv = 3 * i + j - 1
-
-                    # update coordinates following the move mv
-                    self.edge4[n + 1] = self.tables.edge4_move[self.edge4[n]][
-                        mv
-                    ]
-                    self.edge8[n + 1] = self.tables.edge8_move[self.edge8[n]][
-                        mv
+                moves[n] = mv
+
+                # update coordinates following the move mv
+                new_edge4 = edge4[n + 1] = edge4_move[edge4[n] * 18 + mv]
+                new_edge8 = edge8[n + 1] = edge8_move[edge8[n] * 18 + mv]
+                new_corner = corner[n + 1] = corner_move[corner[n] * 18 + mv]
+                i = new_edge4 * n_corner + new_corner
+                dist = (edge4_corner_prune[i >> 1] >> ((i & 1) << 2)) & 15
+                i = new_edge4 * n_edge8 + new_edge8
+                dist_edge8 = (edge4_edge8_prune[i >> 1] >> ((i & 1) << 2)) & 15
+                if dist_edge8 > dist:
+                    dist = dist_edge8
+                if corner_edge8:
+                    i = corner_classidx[new_corner] * n_edge8 + edge8_conj[
+                        (new_edge8 << 4) + corner_sym[new_corner]
                     ]
-                    self.corner[n + 1] = self.tables.corner_move[
-                        self.corner[n]
-                    ][mv]
-                    self.min_dist_2[n + 1] = self._phase_2_cost(n + 1)
+                    dist_corner = (
+                        corner_edge8_prune[i >> 1] >> ((i & 1) << 2)
+                    ) & 15
+                    if dist_corner > dist:
+                        dist = dist_corner
+                min_dist_2[n + 1] = dist
+                nodes += 1
+                if depth_nodes is not None:
+                    depth_nodes[n + 1] += 1
 
+                if dist == 0:
+                    return n + 1
+                elif dist < end - n:
                     # start search from new node
-                    m = self._phase_2_search(n + 1, depth - 1)
-                    if m >= 0:
-                        return m
-        # if no moves lead to a tree with a solution or min_dist_2 > depth then
-        # we return -1 to signify lack of solution
-        return -1
+                    n += 1
+                    successors[n] = iter(PHASE_2_SUCCESSORS[mv // 3])
+                elif depth_nodes is not None:
+                    cutoffs += 1
+        finally:
+            self.phase_2_nodes += nodes
+            if stats is not None:
+                stats.phase_2_cutoffs += cutoffs
 
     def _solution_to_string(self, length):
         """
@@ -238,18 +981,30 @@ class SolutionManager:
         clockwise quarter turn of the F face, U' means a counter clockwise
         quarter turn of the U face, R2 means a half turn of the R face etc.
         """
+        return moves_to_string(self.moves[:length])
 
-        def recover_move(axis_power):
-            axis, power = axis_power
-            if power == 1:
-                return Color(axis).name
-            if power == 2:
-                return Color(axis).name + "2"
-            if power == 3:
-                return Color(axis).name + "'"
+
+# suffixes of 1, 2 and 3 clockwise quarter turns in cube notation
+_POWER_SUFFIX = ("", "2", "'")
+
+
+def moves_to_string(moves):
+    """
+    Convert a sequence of moves, encoded as 3 * face + quarter turns - 1, to
+    a solution string.
+    """
+    solution = []
+    for mv in moves:
+        axis, power = divmod(mv, 3)
+        if not 0 <= axis < 6:
             raise RuntimeError("Invalid move in solution.")
+        solution.append(Color(axis).name + _POWER_SUFFIX[power])
+    return " ".join(solution)
 
-        solution = map(
-            recover_move, zip(self.axis[:length], self.power[:length])
-        )
-        return " ".join(solution)
+
+def string_to_moves(solution):
+    """Inverse of moves_to_string."""
+    return [
+        3 * Color[move[0]] + _POWER_SUFFIX.index(move[1:])
+        for move in solution.split()
+    ]
@@ -0,0 +1,266 @@
+"""
+Versioned binary storage for the move and pruning tables.
+
+A table file starts with a fixed size preamble (magic bytes, format version
+and header length) followed by a JSON header recording the name, dtype, shape
+and offset of every stored array. The raw array data follows the header, each
+array starting on a 64 byte boundary. Files are opened with numpy.memmap so
+loading is close to instant and the pages are shared by every process that
+maps the same file. The same layout can also be published into a named
+shared memory segment, see publish_tables and attach_tables.
+"""
+import contextlib
+import json
+import mmap
+import os
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    import fcntl
+    import _posixshmem
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b"RUBIKTBL"
+# version 2 stores the pruning tables packed at two entries per byte, version
+# 3 adds the move tables for the coordinates carried through phase 1
+FORMAT_VERSION = 3
+
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+
+# shared memory segments attached by this process on Windows. They are kept
+# open for the life of the process, as arrays viewing them may be anywhere.
+_attached = []
+
+
+def _align(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _layout(tables):
+    """
+    Lay out tables in the binary table format. Returns the arrays, the
+    encoded preamble and header, the offset of the array data and the total
+    size.
+    """
+    arrays, entries, offset = [], [], 0
+    for name, table in tables.items():
+        array = np.ascontiguousarray(table)
+        offset = _align(offset)
+        entries.append(
+            {
+                "name": name,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+            }
+        )
+        arrays.append(array)
+        offset += array.nbytes
+    header = json.dumps({"tables": entries}).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header))
+    preamble = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header))
+    return (
+        list(zip(entries, arrays)),
+        preamble + header,
+        data_start,
+        data_start + offset,
+    )
+
+
+def write_tables(path, tables):
+    """
+    Write tables to path in the binary table format.
+
+    The file is written under a temporary name and atomically renamed into
+    place, so other processes never see a partially written file.
+
+    Parameters
+    ----------
+    path: str
+        Location of the file to write.
+    tables: dict
+        Mapping of table name to array. Arrays are stored with their own
+        dtype and shape.
+    """
+    arrays, header, data_start, _ = _layout(tables)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for entry, array in arrays:
+                f.seek(data_start + entry["offset"])
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _parse_header(data, source):
+    """
+    Check the preamble at the start of data and decode the header following
+    it. Returns the header and the offset of the array data.
+    """
+    preamble = bytes(data[: _PREAMBLE.size])
+    if len(preamble) != _PREAMBLE.size:
+        raise ValueError(f"{source} is not a table file")
+    magic, version, header_length = _PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise ValueError(f"{source} is not a table file")
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"{source} has table format version {version}, expected "
+            f"{FORMAT_VERSION}"
+        )
+    end = _PREAMBLE.size + header_length
+    header = json.loads(bytes(data[_PREAMBLE.size : end]).decode("utf-8"))
+    return header, _align(end)
+
+
+def _views(buffer, header, data_start):
+    """Views of the arrays described by header into buffer, a uint8 array."""
+    tables = {}
+    for entry in header["tables"]:
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        start = data_start + entry["offset"]
+        stop = start + dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        tables[entry["name"]] = buffer[start:stop].view(dtype).reshape(shape)
+    return tables
+
+
+def read_tables(path):
+    """
+    Map the tables stored at path into memory.
+
+    Returns a dictionary of read-only numpy arrays backed by a single memory
+    map of the file, nothing is copied into the process heap.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a table file or was written with a different
+        format version.
+    """
+    with open(path, "rb") as f:
+        data = f.read(_PREAMBLE.size)
+        if len(data) == _PREAMBLE.size:
+            data += f.read(_PREAMBLE.unpack(data)[2])
+    header, data_start = _parse_header(data, path)
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    return _views(buffer, header, data_start)
+
+
+def publish_tables(name, tables):
+    """
+    Copy tables into a new shared memory segment called name, in the binary
+    table format, so other processes can map them with attach_tables.
+
+    The caller owns the segment: it stays available until the returned
+    SharedMemory is unlinked, so call close and unlink on it once the
+    processes using the tables have finished.
+
+    Parameters
+    ----------
+    name: str or None
+        Name of the segment, None to have one generated.
+    tables: dict
+        Mapping of table name to array.
+
+    Returns
+    -------
+    multiprocessing.shared_memory.SharedMemory
+    """
+    arrays, header, data_start, size = _layout(tables)
+    segment = shared_memory.SharedMemory(name, create=True, size=size)
+    try:
+        segment.buf[: len(header)] = header
+        buffer = np.frombuffer(segment.buf, dtype=np.uint8)
+        for entry, array in arrays:
+            start = data_start + entry["offset"]
+            buffer[start : start + array.nbytes] = array.reshape(-1).view(
+                np.uint8
+            )
+        del buffer
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    return segment
+
+
+def attach_tables(name):
+    """
+    Map the tables in the shared memory segment called name, see
+    publish_tables.
+
+    Returns a dictionary of read-only numpy arrays viewing the segment,
+    nothing is copied. The segment stays mapped as long as the arrays are
+    alive, and attaching never unlinks it.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no segment called name.
+    ValueError
+        If the segment doesn't hold tables in the current format version.
+    """
+    if os.name == "posix":
+        # open the segment directly rather than through SharedMemory, which
+        # registers it with the resource tracker. The tracker would unlink it
+        # when this process exits, pulling it from under every other process.
+        fd = _posixshmem.shm_open(
+            name if name.startswith("/") else "/" + name, os.O_RDONLY
+        )
+        try:
+            segment = mmap.mmap(
+                fd, os.fstat(fd).st_size, prot=mmap.PROT_READ
+            )
+        finally:
+            os.close(fd)
+        buffer = np.frombuffer(segment, dtype=np.uint8)
+    else:
+        segment = shared_memory.SharedMemory(name)
+        # closing the segment would unmap it under the arrays
+        _attached.append(segment)
+        buffer = np.frombuffer(segment.buf, dtype=np.uint8)
+        buffer.flags.writeable = False
+    header, data_start = _parse_header(buffer, f"shared memory {name}")
+    return _views(buffer, header, data_start)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Context manager holding an exclusive lock on the file at path, which is
+    created if it doesn't exist. Blocks until the lock is acquired, so it
+    serialises work across processes on the same machine.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK only retries for 10 seconds before giving up
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
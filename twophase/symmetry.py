@@ -0,0 +1,484 @@
+"""
+Symmetries of the cube and the symmetry reduced coordinates built on them.
+
+The cube has 48 symmetries, generated by a 120 degree rotation about the
+URF-DBL diagonal, a half turn about the F-B axis, a quarter turn about the U-D
+axis and a reflection in the plane between the L and R faces. Symmetry
+16 * urf3 + 8 * f2 + 2 * u4 + lr2 is URF3^urf3 F2^f2 U4^u4 LR2^lr2, so the
+first 16 symmetries are the ones that fix the U-D axis (the group D4h). These
+map the phase 1 and phase 2 subgroups to themselves, so conjugating a position
+by one of them changes neither its phase 1 nor its phase 2 distance.
+
+A coordinate is reduced by symmetry by splitting its values into classes of
+values that are conjugate under D4h. Each class is represented by its
+smallest member, and a pruning table over the classes is 16 times smaller than
+one over the raw coordinate.
+"""
+import numpy as np
+
+from .cubes import batch
+from .cubes.cubiecube import MOVE_CUBE, CubieCube
+from .pieces import Corner, Edge
+
+# number of symmetries fixing the U-D axis
+N_SYM_D4H = 16
+
+# 120 degree clockwise rotation about the URF-DBL axis
+_ROT_URF3 = CubieCube(
+    [
+        Corner.URF,
+        Corner.DFR,
+        Corner.DLF,
+        Corner.UFL,
+        Corner.UBR,
+        Corner.DRB,
+        Corner.DBL,
+        Corner.ULB,
+    ],
+    [1, 2, 1, 2, 2, 1, 2, 1],
+    [
+        Edge.UF,
+        Edge.FR,
+        Edge.DF,
+        Edge.FL,
+        Edge.UB,
+        Edge.BR,
+        Edge.DB,
+        Edge.BL,
+        Edge.UR,
+        Edge.DR,
+        Edge.DL,
+        Edge.UL,
+    ],
+    [1, 0, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1],
+)
+
+# half turn about the F-B axis
+_ROT_F2 = CubieCube(
+    [
+        Corner.DLF,
+        Corner.DFR,
+        Corner.DRB,
+        Corner.DBL,
+        Corner.UFL,
+        Corner.URF,
+        Corner.UBR,
+        Corner.ULB,
+    ],
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [
+        Edge.DL,
+        Edge.DF,
+        Edge.DR,
+        Edge.DB,
+        Edge.UL,
+        Edge.UF,
+        Edge.UR,
+        Edge.UB,
+        Edge.FL,
+        Edge.FR,
+        Edge.BR,
+        Edge.BL,
+    ],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+)
+
+# quarter turn about the U-D axis
+_ROT_U4 = CubieCube(
+    [
+        Corner.UBR,
+        Corner.URF,
+        Corner.UFL,
+        Corner.ULB,
+        Corner.DRB,
+        Corner.DFR,
+        Corner.DLF,
+        Corner.DBL,
+    ],
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [
+        Edge.UB,
+        Edge.UR,
+        Edge.UF,
+        Edge.UL,
+        Edge.DB,
+        Edge.DR,
+        Edge.DF,
+        Edge.DL,
+        Edge.BR,
+        Edge.FR,
+        Edge.FL,
+        Edge.BL,
+    ],
+    [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1],
+)
+
+# reflection in the plane between the L and R faces. Reflected corners have
+# orientation 3, 4 or 5, see CubieCube.corner_multiply_full
+_MIRR_LR2 = CubieCube(
+    [
+        Corner.UFL,
+        Corner.URF,
+        Corner.UBR,
+        Corner.ULB,
+        Corner.DLF,
+        Corner.DFR,
+        Corner.DRB,
+        Corner.DBL,
+    ],
+    [3, 3, 3, 3, 3, 3, 3, 3],
+    [
+        Edge.UL,
+        Edge.UF,
+        Edge.UR,
+        Edge.UB,
+        Edge.DL,
+        Edge.DF,
+        Edge.DR,
+        Edge.DB,
+        Edge.FL,
+        Edge.FR,
+        Edge.BR,
+        Edge.BL,
+    ],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+)
+
+
+def _make_symmetries():
+    """
+    Generate the cubie representation of the 48 symmetries, and the index of
+    the inverse of each.
+    """
+    symmetries = []
+    cube = CubieCube()
+    for urf3 in range(3):
+        for f2 in range(2):
+            for u4 in range(4):
+                for lr2 in range(2):
+                    symmetries.append(
+                        CubieCube(cube.cp, cube.co, cube.ep, cube.eo)
+                    )
+                    cube.multiply_full(_MIRR_LR2)
+                cube.multiply_full(_ROT_U4)
+            cube.multiply_full(_ROT_F2)
+        cube.multiply_full(_ROT_URF3)
+
+    inverse = []
+    for s in symmetries:
+        for j, t in enumerate(symmetries):
+            product = CubieCube(s.cp, s.co, s.ep, s.eo)
+            product.multiply_full(t)
+            if (
+                product.cp == list(range(8))
+                and product.ep == list(range(12))
+                and not any(product.co)
+                and not any(product.eo)
+            ):
+                inverse.append(j)
+                break
+    return symmetries, inverse
+
+
+SYMMETRIES, INVERSE = _make_symmetries()
+
+# the symmetries rotating the cube about the URF-DBL diagonal by 0, 120 and
+# 240 degrees, which take the U-D axis to each of the three axes
+URF_ROTATIONS = (0, 16, 32)
+
+
+def conjugate(cube, s):
+    """
+    Conjugate cube by symmetry s, returns the CubieCube S * cube * S^-1.
+    """
+    result = CubieCube(
+        SYMMETRIES[s].cp, SYMMETRIES[s].co, SYMMETRIES[s].ep, SYMMETRIES[s].eo
+    )
+    result.multiply_full(cube)
+    result.multiply_full(SYMMETRIES[INVERSE[s]])
+    return result
+
+
+def _make_move_conj():
+    """
+    Conjugation table for the 18 moves. Entry [s][mv] is the move
+    S * mv * S^-1 for every one of the 48 symmetries s.
+    """
+    move_cubes = []
+    for i in range(6):
+        cube = CubieCube()
+        for _ in range(3):
+            cube.multiply(MOVE_CUBE[i])
+            move_cubes.append((cube.cp[:], cube.co[:], cube.ep[:], cube.eo[:]))
+    move_conj = []
+    for s in range(len(SYMMETRIES)):
+        row = []
+        for cp, co, ep, eo in move_cubes:
+            conj = conjugate(CubieCube(cp, co, ep, eo), s)
+            row.append(move_cubes.index((conj.cp, conj.co, conj.ep, conj.eo)))
+        move_conj.append(tuple(row))
+    return tuple(move_conj)
+
+
+MOVE_CONJ = _make_move_conj()
+
+
+def _symmetry_arrays(s):
+    """Cubie level arrays of symmetry s and its inverse."""
+    sym, inv = SYMMETRIES[s], SYMMETRIES[INVERSE[s]]
+    return (
+        np.array(sym.cp, dtype=np.int64),
+        np.array(sym.co, dtype=np.int64),
+        np.array(sym.ep, dtype=np.int64),
+        np.array(sym.eo, dtype=np.int64),
+        np.array(inv.cp, dtype=np.int64),
+        np.array(inv.co, dtype=np.int64),
+        np.array(inv.ep, dtype=np.int64),
+        np.array(inv.eo, dtype=np.int64),
+    )
+
+
+def _co_multiply(ori_a, ori_b):
+    """
+    Batched orientation rule of CubieCube.corner_multiply_full. If the corner
+    of the first cube is reflected the orientation of the second is
+    subtracted rather than added, and the result is reflected if exactly one
+    of the two is.
+    """
+    mirror_a, mirror_b = ori_a >= 3, ori_b >= 3
+    ori = np.where(mirror_a, ori_a - ori_b, ori_a + ori_b) % 3
+    return ori + 3 * (mirror_a != mirror_b)
+
+
+def conjugate_corners(cp, co, s):
+    """
+    Batched conjugation of corner permutations and orientations by symmetry
+    s, see conjugate.
+    """
+    s_cp, s_co, _, _, inv_cp, inv_co, _, _ = _symmetry_arrays(s)
+    # S * X
+    cp, co = s_cp[cp], _co_multiply(s_co[cp], co)
+    # (S * X) * S^-1
+    return cp[:, inv_cp], _co_multiply(co[:, inv_cp], inv_co)
+
+
+def conjugate_edges(ep, eo, s):
+    """
+    Batched conjugation of edge permutations and orientations by symmetry s,
+    see conjugate.
+    """
+    _, _, s_ep, s_eo, _, _, inv_ep, inv_eo = _symmetry_arrays(s)
+    # S * X
+    ep, eo = s_ep[ep], (s_eo[ep] + eo) % 2
+    # (S * X) * S^-1
+    return ep[:, inv_ep], (eo[:, inv_ep] + inv_eo) % 2
+
+
+def make_twist_conj():
+    """
+    Conjugation table for the twist coordinate. Entry [twist, s] is the twist
+    of S * X * S^-1 for any X with the given twist, s < 16.
+    """
+    twist = np.arange(2187)
+    cp = np.tile(np.arange(8), (len(twist), 1))
+    co = batch.decode_twist(twist)
+    twist_conj = np.empty((len(twist), N_SYM_D4H), dtype=np.int64)
+    for s in range(N_SYM_D4H):
+        twist_conj[:, s] = batch.encode_twist(conjugate_corners(cp, co, s)[1])
+    return twist_conj
+
+
+def make_flipslice_conj():
+    """
+    Conjugation table for the combined flipslice coordinate
+    udslice * 2048 + flip. Entry [flipslice, s] is the flipslice of
+    S * X * S^-1 for any X with the given flipslice, s < 16.
+
+    The symmetries in D4h map the slice edges to the slice edges and the
+    other edges to the other edges, flipping either all slice edges or none,
+    so the conjugated flip is the exclusive or of a part depending only on
+    the flip and a part depending only on the slice edge positions.
+    """
+    udslice = np.arange(495)
+    flip = np.arange(2048)
+    ep = batch.decode_udslice(udslice)
+    eo = batch.decode_flip(flip)
+    identity_ep = np.tile(np.arange(12), (len(flip), 1))
+    zero_eo = np.zeros_like(ep)
+    flipslice_conj = np.empty((495 * 2048, N_SYM_D4H), dtype=np.int64)
+    for s in range(N_SYM_D4H):
+        slice_ep, slice_eo = conjugate_edges(ep, zero_eo, s)
+        flip_eo = conjugate_edges(identity_ep, eo, s)[1]
+        # conjugating the solved cube leaves no edges flipped, so the
+        # constant parts of the two halves cancel in the exclusive or
+        flipslice_conj[:, s] = (
+            batch.encode_udslice(slice_ep)[:, None] * 2048
+            + (
+                batch.encode_flip(slice_eo)[:, None]
+                ^ batch.encode_flip(flip_eo)[None, :]
+            )
+        ).ravel()
+    return flipslice_conj
+
+
+def make_corner_conj():
+    """
+    Conjugation table for the corner permutation coordinate. Entry
+    [corner, s] is the corner permutation of S * X * S^-1 for any X with the
+    given corner permutation, s < 16.
+    """
+    corner = np.arange(40320)
+    cp = batch.decode_perm(corner, range(8))
+    co = np.zeros_like(cp)
+    corner_conj = np.empty((len(corner), N_SYM_D4H), dtype=np.int64)
+    for s in range(N_SYM_D4H):
+        corner_conj[:, s] = batch.encode_perm(conjugate_corners(cp, co, s)[0])
+    return corner_conj
+
+
+def make_edge8_conj():
+    """
+    Conjugation table for the edge8 coordinate of phase 2 positions. Entry
+    [edge8, s] is the edge8 of S * X * S^-1 for any X in the phase 2 subgroup
+    with the given edge8, s < 16.
+    """
+    edge8 = np.arange(40320)
+    ep = np.hstack(
+        [
+            batch.decode_perm(edge8, range(8)),
+            np.tile(np.arange(8, 12), (len(edge8), 1)),
+        ]
+    )
+    eo = np.zeros_like(ep)
+    edge8_conj = np.empty((len(edge8), N_SYM_D4H), dtype=np.int64)
+    for s in range(N_SYM_D4H):
+        conj_ep = conjugate_edges(ep, eo, s)[0]
+        edge8_conj[:, s] = batch.encode_perm(conj_ep[:, :8])
+    return edge8_conj
+
+
+def make_classes(conj):
+    """
+    Reduce a coordinate by symmetry.
+
+    Parameters
+    ----------
+    conj: numpy.ndarray
+        Conjugation table of the coordinate, of shape (size, 16).
+
+    Returns
+    -------
+    classidx: numpy.ndarray
+        Index of the class of each coordinate value.
+    sym: numpy.ndarray
+        For each coordinate value, a symmetry conjugating it to the
+        representative of its class.
+    rep: numpy.ndarray
+        The representative (smallest member) of each class.
+    selfsym: numpy.ndarray
+        For each class, a bit mask of the symmetries that fix its
+        representative.
+    """
+    sym = np.argmin(conj, axis=1)
+    rep_of = conj[np.arange(len(conj)), sym]
+    rep = np.unique(rep_of)
+    classidx = np.searchsorted(rep, rep_of)
+    selfsym = (
+        (conj[rep] == rep[:, None]) << np.arange(N_SYM_D4H, dtype=np.int64)
+    ).sum(axis=1)
+    return classidx, sym, rep, selfsym
+
+
+def sym_prune_bfs(rep_move, classidx, sym, selfsym, move_b, conj_b, moves):
+    """
+    Breadth first generation of a pruning table over a symmetry reduced
+    coordinate and a raw coordinate.
+
+    Entry c * size_b + b of the returned table is the number of moves needed
+    to solve the positions whose first coordinate lies in class c and whose
+    second coordinate is b after conjugating the first coordinate to the
+    class representative. Positions fixed by some of the symmetries have
+    several entries, which are all filled at once.
+
+    The first depths are expanded forwards from the frontier. Once more than
+    half of the table has been filled it is cheaper to search backwards, and
+    each unfilled entry is checked for a neighbour in the frontier instead.
+    Entries are processed in chunks to bound the memory used.
+
+    Parameters
+    ----------
+    rep_move: numpy.ndarray
+        Raw value of the first coordinate after applying each move to each
+        class representative, of shape (n_classes, 18).
+    classidx, sym, selfsym: numpy.ndarray
+        Symmetry reduction of the first coordinate, see make_classes.
+    move_b, conj_b: numpy.ndarray
+        Move and conjugation tables of the second coordinate.
+    moves: sequence of int
+        Moves allowed in the search.
+
+    Returns
+    -------
+    table: numpy.ndarray
+        Table of distances, uint8.
+    """
+    rep_move = np.asarray(rep_move, dtype=np.int64)
+    move_b = np.asarray(move_b, dtype=np.int64)
+    conj_b = np.asarray(conj_b, dtype=np.int64)
+    classidx = np.asarray(classidx, dtype=np.int64)
+    sym = np.asarray(sym, dtype=np.int64)
+    size_b = len(move_b)
+    size = len(rep_move) * size_b
+    chunk = 1 << 20
+
+    unset = 255
+    table = np.full(size, unset, dtype=np.uint8)
+
+    def neighbours(entries, mv):
+        c, b = np.divmod(entries, size_b)
+        a = rep_move[c, mv]
+        return classidx[a] * size_b + conj_b[move_b[b, mv], sym[a]]
+
+    def twins(entries):
+        # entries of the same positions, conjugated by the symmetries fixing
+        # the class representative
+        c, b = np.divmod(entries, size_b)
+        masks = selfsym[c]
+        result = [entries]
+        for s in range(1, N_SYM_D4H):
+            fixed = (masks >> s) & 1 == 1
+            if fixed.any():
+                result.append(c[fixed] * size_b + conj_b[b[fixed], s])
+        return np.concatenate(result)
+
+    table[twins(np.zeros(1, dtype=np.int64))] = 0
+    count = np.count_nonzero(table == 0)
+    depth = 0
+    while count < size:
+        backwards = count > size // 2
+        if backwards:
+            candidates = np.flatnonzero(table == unset)
+        else:
+            candidates = np.flatnonzero(table == depth)
+        for start in range(0, len(candidates), chunk):
+            entries = candidates[start : start + chunk]
+            if backwards:
+                found = []
+                for mv in moves:
+                    hit = table[neighbours(entries, mv)] == depth
+                    found.append(entries[hit])
+                    entries = entries[~hit]
+                new = np.concatenate(found)
+            else:
+                new = np.concatenate(
+                    [neighbours(entries, mv) for mv in moves]
+                )
+                new = np.unique(new[table[new] == unset])
+            new = twins(new)
+            table[new[table[new] == unset]] = depth + 1
+        added = np.count_nonzero(table == depth + 1)
+        if not added:
+            raise RuntimeError("pruning table has unreachable entries")
+        count += added
+        depth += 1
+    return table
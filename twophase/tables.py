@@ -1,10 +1,92 @@
+import contextlib
 import json
 import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from .cubes.cubiecube import MOVE_CUBE, CubieCube
 
-def get_tables_path():
-    """Get the path to the tables.json file in the user's home directory"""
+import numpy as np
+
+from . import nearsolved, symmetry
+from .cubes import batch
+from .store import (
+    attach_tables,
+    file_lock,
+    publish_tables,
+    read_tables,
+    write_tables,
+)
+
+# name of the environment variable that, if set, makes Tables use the tables
+# published to the shared memory segment it names, see Tables.publish
+TABLES_SEGMENT_ENV = "RUBIKSOLVER_TABLES_SEGMENT"
+
+# dtype used to store each table in the binary table file. Pruning tables are
+# stored packed at two entries per byte, see PruningTable.
+TABLE_DTYPES = {
+    "twist_move": np.int16,
+    "flip_move": np.int16,
+    "udslice_move": np.int16,
+    "edge4_move": np.int16,
+    "edge8_move": np.int32,
+    "corner_move": np.int32,
+    "corner_full_move": np.int32,
+    "udslice_sorted_move": np.int16,
+    "u_edges_move": np.int16,
+    "d_edges_move": np.int16,
+    "ud_edges_edge8": np.int32,
+    "udslice_twist_prune": np.uint8,
+    "udslice_flip_prune": np.uint8,
+    "edge4_edge8_prune": np.uint8,
+    "edge4_corner_prune": np.uint8,
+}
+
+# dtypes of the optional symmetry reduced phase 1 table and the lookup tables
+# it needs, stored in a file of their own
+FLIPSLICE_TWIST_DTYPES = {
+    "flipslice_classidx": np.uint16,
+    "flipslice_sym": np.uint8,
+    "flipslice_rep": np.uint32,
+    "twist_conj": np.uint16,
+    "flipslice_twist_prune": np.uint8,
+}
+
+# dtypes of the optional symmetry reduced phase 2 table and its lookup tables
+CORNER_EDGE8_DTYPES = {
+    "corner_classidx": np.uint16,
+    "corner_sym": np.uint8,
+    "corner_rep": np.uint16,
+    "edge8_conj": np.uint16,
+    "corner_edge8_prune": np.uint8,
+}
+
+# dtypes of the symmetry reduced corner pruning table used by the optimal
+# solver and its lookup tables
+CORNER_TWIST_DTYPES = {
+    "corner_classidx": np.uint16,
+    "corner_sym": np.uint8,
+    "corner_rep": np.uint16,
+    "twist_conj": np.uint16,
+    "corner_twist_prune": np.uint8,
+}
+
+# dtypes of the index of positions close to solved, see nearsolved
+NEAR_SOLVED_DTYPES = {
+    "near_solved_keys": np.uint64,
+    "near_solved_moves": np.uint8,
+}
+
+# seconds taken to load each table file in this process, including building
+# it if it was missing, keyed by file name
+LOAD_TIMES = {}
+
+# moves allowed in phase 2: all turns of U and D, half turns of R, F, L, B. The
+# phase 2 move tables store -1 for the remaining moves.
+PHASE_2_MOVES = (0, 1, 2, 4, 7, 9, 10, 11, 13, 16)
+
+
+def get_tables_path(filename="tables.bin"):
+    """Get the path to a table file in the user's home directory"""
     home = str(Path.home())
     rubiksolver_dir = os.path.join(home, '.rubiksolver')
     
@@ -12,12 +94,129 @@ def get_tables_path():
     if not os.path.exists(rubiksolver_dir):
         os.makedirs(rubiksolver_dir)
     
-    return os.path.join(rubiksolver_dir, 'tables.json')
+    return os.path.join(rubiksolver_dir, filename)
+
+
+def convert_json_tables(json_path, tables_path):
+    """
+    Convert a tables.json file written by older versions of the solver to the
+    binary table format, so that existing tables don't have to be rebuilt.
+    """
+    with open(json_path, "r") as f:
+        tables = json.load(f)
+    # tables added after the JSON format was retired are generated
+    for name, builder in Tables.move_table_builders().items():
+        if name not in tables:
+            tables[name] = builder()
+    write_tables(tables_path, _stored_tables(tables))
+
+
+def _stored_tables(tables, dtypes=TABLE_DTYPES):
+    """
+    Convert freshly generated tables to the arrays that are written to the
+    table file.
+    """
+    stored = {}
+    for name, dtype in dtypes.items():
+        if name.endswith("_prune"):
+            stored[name] = PruningTable.pack(tables[name])
+        else:
+            stored[name] = np.asarray(tables[name], dtype=dtype)
+    return stored
+
+
+def prune_bfs(move_a, move_b, size_b):
+    """
+    Breadth first generation of a pruning table over pairs of coordinates.
+
+    Entry a * size_b + b of the returned table is the number of moves needed
+    to bring the pair (a, b) to (0, 0). Each depth is expanded in one batch:
+    every entry of the frontier is pushed through all 18 columns of the two
+    move tables with a single gather, and the unvisited results are filled in
+    with a single scatter.
+
+    Parameters
+    ----------
+    move_a, move_b: array_like
+        Move tables of the two coordinates, of shape (n_a, 18) and
+        (size_b, 18).
+    size_b: int
+        Number of values taken by the second coordinate.
+
+    Notes
+    -----
+    Moves that aren't allowed in phase 2 are stored as -1 in the phase 2 move
+    tables, giving negative neighbours. These wrap around to the end of the
+    table exactly as negative list indices did in the original pure Python
+    generators, so that the tables produced are identical to theirs.
+    """
+    move_a = np.asarray(move_a, dtype=np.int64)
+    move_b = np.asarray(move_b, dtype=np.int64)
+    size = len(move_a) * size_b
+    table = np.full(size, -1, dtype=np.int8)
+    table[0] = 0
+    count, depth = 1, 0
+    while count < size:
+        frontier = np.flatnonzero(table == depth)
+        neighbours = (
+            move_a[frontier // size_b] * size_b + move_b[frontier % size_b]
+        ).ravel()
+        neighbours %= size
+        table[neighbours[table[neighbours] == -1]] = depth + 1
+        count += np.count_nonzero(table == depth + 1)
+        depth += 1
+    return table
+
+
+def _map_tables(tables_path, build):
+    """
+    Map the tables stored at tables_path, calling build(tables_path) to write
+    the file first if it is missing or was written by an incompatible
+    version.
+
+    Only one process on a machine builds a table file, any other process that
+    needs it meanwhile waits for the build to finish and then maps the
+    result.
+    """
+    start = time.perf_counter()
+    try:
+        return read_tables(tables_path)
+    except (FileNotFoundError, ValueError):
+        with file_lock(tables_path + ".lock"):
+            # the tables may have been built while waiting for the lock
+            try:
+                return read_tables(tables_path)
+            except (FileNotFoundError, ValueError):
+                build(tables_path)
+                return read_tables(tables_path)
+    finally:
+        LOAD_TIMES[os.path.basename(tables_path)] = (
+            time.perf_counter() - start
+        )
+
+
+def _flat(table):
+    """
+    Flat view of a mapped table. Indexing a memoryview gives plain Python
+    ints, which are much faster to work with than NumPy scalars.
+    """
+    return memoryview(table.reshape(-1))
+
+
+def _submit_serial(fn, *args):
+    """Run fn immediately, with the interface of Executor.submit."""
+    future = Future()
+    future.set_result(fn(*args))
+    return future
 
 
 class PruningTable:
     """
-    Helper class to allow pruning to be used as though they were 2-D tables
+    Helper class to allow pruning to be used as though they were 2-D tables.
+
+    No pruning distance is larger than 15, so entries are packed at two per
+    byte: entry i lives in the low nibble of byte i // 2 if i is even and in
+    the high nibble otherwise.
     """
 
     def __init__(self, table, stride):
@@ -25,7 +224,38 @@ class PruningTable:
         self.stride = stride
 
     def __getitem__(self, x):
-        return self.table[x[0] * self.stride + x[1]]
+        i = x[0] * self.stride + x[1]
+        return (self.table[i >> 1] >> ((i & 1) << 2)) & 15
+
+    def probe(self, a, b):
+        """
+        Look up entry [a, b] without building a tuple, for use in the search.
+        """
+        i = a * self.stride + b
+        return (self.table[i >> 1] >> ((i & 1) << 2)) & 15
+
+    @staticmethod
+    def pack(table):
+        """
+        Pack a table of distances in the range 0, ..., 15 at two entries per
+        byte.
+        """
+        table = np.asarray(table)
+        if len(table) and not 0 <= table.min() <= table.max() <= 15:
+            raise ValueError("pruning table entries must be in 0, ..., 15")
+        table = table.astype(np.uint8)
+        if len(table) % 2:
+            table = np.append(table, np.uint8(0))
+        return table[0::2] | (table[1::2] << 4)
+
+    @staticmethod
+    def unpack(packed):
+        """Inverse of pack, returns one uint8 per entry."""
+        packed = np.asarray(packed, dtype=np.uint8)
+        table = np.empty(2 * len(packed), dtype=np.uint8)
+        table[0::2] = packed & 15
+        table[1::2] = packed >> 4
+        return table
 
 
 class Tables:
@@ -41,6 +271,16 @@ class Tables:
 
     _tables_loaded = False
 
+    # optional symmetry reduced pruning tables, see
+    # load_flipslice_twist_tables, load_corner_edge8_tables and
+    # load_corner_twist_tables
+    flipslice_twist_prune = None
+    corner_edge8_prune = None
+    corner_twist_prune = None
+    # optional index of the positions close to solved, see
+    # load_near_solved_tables
+    near_solved_keys = None
+
     # 3^7 possible corner orientations
     TWIST = 2187
     # 2^11 possible edge flips
@@ -53,238 +293,668 @@ class Tables:
     EDGE8 = 40320
     # 8! possible permutations of the corners
     CORNER = 40320
+    # 12! / 8! possible positions and orders of FR, FL, BL, BR
+    UDSLICE_SORTED = 11880
+    # 12! / 8! possible positions and orders of UR, UF, UL, UB
+    U_EDGES = 11880
+    # 12! / 8! possible positions and orders of DR, DF, DL, DB
+    D_EDGES = 11880
     # 12! possible permutations of all edges
     EDGE = 479001600
     # 6*3 possible moves
     MOVES = 18
+    # greatest number of moves from solved of the positions stored in the
+    # near solved index
+    NEAR_SOLVED_DEPTH = 6
 
-    def __init__(self):
+    def __init__(
+        self,
+        flipslice_twist=False,
+        corner_edge8=False,
+        corner_twist=False,
+        near_solved=False,
+    ):
+        """
+        Parameters
+        ----------
+        flipslice_twist: bool, optional
+            Also load the symmetry reduced flipslice-twist pruning table,
+            building it first if necessary. Once loaded the search uses it in
+            place of the two smaller phase 1 pruning tables.
+        corner_edge8: bool, optional
+            Also load the symmetry reduced corner-edge8 pruning table,
+            building it first if necessary. Once loaded the search uses it
+            alongside the two phase 2 pruning tables.
+        corner_twist: bool, optional
+            Also load the symmetry reduced corner pruning table used by the
+            optimal solver, building it first if necessary.
+        near_solved: bool, optional
+            Also load the index of positions close to solved, building it
+            first if necessary. Once loaded the two-phase search looks every
+            cube up in it before searching.
+        """
         if not self._tables_loaded:
             self.load_tables()
+        if flipslice_twist and self.flipslice_twist_prune is None:
+            self.load_flipslice_twist_tables()
+        if corner_edge8 and self.corner_edge8_prune is None:
+            self.load_corner_edge8_tables()
+        if corner_twist and self.corner_twist_prune is None:
+            self.load_corner_twist_tables()
+        if near_solved and self.near_solved_keys is None:
+            self.load_near_solved_tables()
 
     @classmethod
-    def load_tables(cls):
-        tables_path = get_tables_path()
-        if os.path.isfile(tables_path):
-            with open(tables_path, "r") as f:
-                tables = json.load(f)
-            cls.twist_move = tables["twist_move"]
-            cls.flip_move = tables["flip_move"]
-            cls.udslice_move = tables["udslice_move"]
-            cls.edge4_move = tables["edge4_move"]
-            cls.edge8_move = tables["edge8_move"]
-            cls.corner_move = tables["corner_move"]
-            cls.udslice_twist_prune = PruningTable(
-                tables["udslice_twist_prune"], cls.TWIST
-            )
-            cls.udslice_flip_prune = PruningTable(
-                tables["udslice_flip_prune"], cls.FLIP
-            )
-            cls.edge4_edge8_prune = PruningTable(
-                tables["edge4_edge8_prune"], cls.EDGE8
-            )
-            cls.edge4_corner_prune = PruningTable(
-                tables["edge4_corner_prune"], cls.CORNER
-            )
+    def optional_tables(cls):
+        """
+        Keyword arguments for Tables loading the same optional tables as are
+        loaded in this process, for passing on to worker processes.
+        """
+        return {
+            "flipslice_twist": cls.flipslice_twist_prune is not None,
+            "corner_edge8": cls.corner_edge8_prune is not None,
+            "corner_twist": cls.corner_twist_prune is not None,
+            "near_solved": cls.near_solved_keys is not None,
+        }
+
+    @classmethod
+    def init_worker(cls, optional_tables, segment=None):
+        """
+        Load the tables in a worker process, as they were loaded in the
+        parent process.
+
+        Parameters
+        ----------
+        optional_tables: dict
+            Optional tables to load, as returned by optional_tables in the
+            parent process. Processes started with spawn don't inherit them.
+        segment: str, optional
+            Name of a shared memory segment published with publish, attached
+            to rather than mapping the table files.
+        """
+        if segment is not None:
+            cls.attach(segment)
+        return cls(**optional_tables)
+
+    @classmethod
+    def load_tables(cls, workers=None):
+        """
+        Map the tables from the table file, building it first if necessary.
+        If the RUBIKSOLVER_TABLES_SEGMENT environment variable is set the
+        tables are instead attached from the shared memory segment it names.
+
+        Parameters
+        ----------
+        workers: int, optional
+            Number of processes used if the tables have to be built. Defaults
+            to the number of CPUs.
+        """
+        segment = os.environ.get(TABLES_SEGMENT_ENV)
+        if segment:
+            cls.attach(segment)
         else:
-            # ----------  Phase 1 move tables  ---------- #
-            cls.twist_move = cls.make_twist_table()
-            cls.flip_move = cls.make_flip_table()
-            cls.udslice_move = cls.make_udslice_table()
+            cls._use_tables(cls._map_tables(workers))
+
+    @classmethod
+    def _map_tables(cls, workers=None):
+        return _map_tables(
+            get_tables_path(),
+            lambda path: cls.build_tables(path, workers),
+        )
+
+    @classmethod
+    def _use_tables(cls, tables):
+        # move tables are flat, the entry for coordinate value x and move mv
+        # is at x * 18 + mv. All tables are used straight from the memory map.
+        cls.twist_move = _flat(tables["twist_move"])
+        cls.flip_move = _flat(tables["flip_move"])
+        cls.udslice_move = _flat(tables["udslice_move"])
+        cls.edge4_move = _flat(tables["edge4_move"])
+        cls.edge8_move = _flat(tables["edge8_move"])
+        cls.corner_move = _flat(tables["corner_move"])
+        cls.corner_full_move = _flat(tables["corner_full_move"])
+        cls.udslice_sorted_move = _flat(tables["udslice_sorted_move"])
+        cls.u_edges_move = _flat(tables["u_edges_move"])
+        cls.d_edges_move = _flat(tables["d_edges_move"])
+        # entry u_edges * 24 + d_edges % 24 is the edge8 of a phase 2
+        # position with the given u_edges and d_edges
+        cls.ud_edges_edge8 = _flat(tables["ud_edges_edge8"])
+        cls.udslice_twist_prune = PruningTable(
+            memoryview(tables["udslice_twist_prune"]), cls.TWIST
+        )
+        cls.udslice_flip_prune = PruningTable(
+            memoryview(tables["udslice_flip_prune"]), cls.FLIP
+        )
+        cls.edge4_edge8_prune = PruningTable(
+            memoryview(tables["edge4_edge8_prune"]), cls.EDGE8
+        )
+        cls.edge4_corner_prune = PruningTable(
+            memoryview(tables["edge4_corner_prune"]), cls.CORNER
+        )
+
+        cls._tables_loaded = True
+
+    @classmethod
+    def load_flipslice_twist_tables(cls):
+        """
+        Map the symmetry reduced flipslice-twist pruning table from its table
+        file, building it first if necessary.
 
-            # ----------  Phase 2 move tables  ---------- #
-            cls.edge4_move = cls.make_edge4_table()
-            cls.edge8_move = cls.make_edge8_table()
-            cls.corner_move = cls.make_corner_table()
+        The table gives the number of moves needed to reach phase 2 from
+        every combination of udslice, flip and twist, which is a much
+        stronger bound than the two tables over udslice and twist or flip
+        alone. Its 495 * 2048 * 2187 entries are reduced by the 16 symmetries
+        preserving the U-D axis to 64430 * 2187, which are packed into about
+        70MB. A lookup conjugates the position so that its flipslice is the
+        representative of its class, see symmetry.make_classes.
+        """
+        if not cls._tables_loaded:
+            cls.load_tables()
+        cls._use_flipslice_twist_tables(cls._map_flipslice_twist_tables())
 
-            # ----------  Phase 1 pruning tables  ---------- #
-            cls.udslice_twist_prune = cls.make_udslice_twist_prune()
-            cls.udslice_flip_prune = cls.make_udslice_flip_prune()
+    @classmethod
+    def _map_flipslice_twist_tables(cls):
+        return _map_tables(
+            get_tables_path("flipslice_twist.bin"),
+            lambda path: write_tables(path, cls.make_flipslice_twist_tables()),
+        )
 
-            # --------  Phase 2 pruning tables  ---------- #
-            cls.edge4_edge8_prune = cls.make_edge4_edge8_prune()
-            cls.edge4_corner_prune = cls.make_edge4_corner_prune()
+    @classmethod
+    def _use_flipslice_twist_tables(cls, tables):
+        cls.flipslice_classidx = _flat(tables["flipslice_classidx"])
+        cls.flipslice_sym = _flat(tables["flipslice_sym"])
+        cls.flipslice_rep = _flat(tables["flipslice_rep"])
+        cls.twist_conj = _flat(tables["twist_conj"])
+        cls.flipslice_twist_prune = PruningTable(
+            memoryview(tables["flipslice_twist_prune"]), cls.TWIST
+        )
 
+    @classmethod
+    def load_corner_edge8_tables(cls):
+        """
+        Map the symmetry reduced corner-edge8 pruning table from its table
+        file, building it first if necessary.
+
+        The table gives the number of phase 2 moves needed to solve the
+        corners and the U and D edges together, which the edge4-corner and
+        edge4-edge8 tables can't see. The 40320 corner permutations are
+        reduced by the 16 symmetries preserving the U-D axis to 2768 classes,
+        so the table has 2768 * 40320 entries, packed into about 56MB.
+        """
+        if not cls._tables_loaded:
+            cls.load_tables()
+        cls._use_corner_edge8_tables(cls._map_corner_edge8_tables())
+
+    @classmethod
+    def _map_corner_edge8_tables(cls):
+        return _map_tables(
+            get_tables_path("corner_edge8.bin"),
+            lambda path: write_tables(path, cls.make_corner_edge8_tables()),
+        )
+
+    @classmethod
+    def _use_corner_edge8_tables(cls, tables):
+        cls.corner_classidx = _flat(tables["corner_classidx"])
+        cls.corner_sym = _flat(tables["corner_sym"])
+        cls.corner_rep = _flat(tables["corner_rep"])
+        cls.edge8_conj = _flat(tables["edge8_conj"])
+        cls.corner_edge8_prune = PruningTable(
+            memoryview(tables["corner_edge8_prune"]), cls.EDGE8
+        )
+
+    @classmethod
+    def load_corner_twist_tables(cls):
+        """
+        Map the symmetry reduced corner pruning table from its table file,
+        building it first if necessary.
+
+        The table gives the number of moves needed to solve the corners,
+        from their permutation and orientation, using all 18 moves. It is a
+        lower bound on the length of a full solution, used by the optimal
+        solver. The 40320 corner permutations are reduced to 2768 classes as
+        for the corner-edge8 table, so the table has 2768 * 2187 entries,
+        packed into about 3MB.
+        """
+        if not cls._tables_loaded:
+            cls.load_tables()
+        cls._use_corner_twist_tables(cls._map_corner_twist_tables())
+
+    @classmethod
+    def _map_corner_twist_tables(cls):
+        return _map_tables(
+            get_tables_path("corner_twist.bin"),
+            lambda path: write_tables(path, cls.make_corner_twist_tables()),
+        )
+
+    @classmethod
+    def _use_corner_twist_tables(cls, tables):
+        # the lookup tables are the same as those stored with the
+        # flipslice-twist and corner-edge8 tables
+        cls.corner_classidx = _flat(tables["corner_classidx"])
+        cls.corner_sym = _flat(tables["corner_sym"])
+        cls.corner_rep = _flat(tables["corner_rep"])
+        cls.twist_conj = _flat(tables["twist_conj"])
+        cls.corner_twist_prune = PruningTable(
+            memoryview(tables["corner_twist_prune"]), cls.TWIST
+        )
+
+    @classmethod
+    def load_near_solved_tables(cls):
+        """
+        Map the index of the positions at most NEAR_SOLVED_DEPTH moves from
+        solved from its table file, building it first if necessary.
+
+        The index holds the 8.2 million positions at most 6 moves from solved
+        under a 64 bit key, along with the first move of an optimal solution
+        of each, in about 75MB. Positions up to 7 moves away are solved
+        optimally by looking up their neighbours, see nearsolved.
+        """
+        if not cls._tables_loaded:
+            cls.load_tables()
+        cls._use_near_solved_tables(cls._map_near_solved_tables())
+
+    @classmethod
+    def _map_near_solved_tables(cls):
+        return _map_tables(
+            get_tables_path("near_solved.bin"),
+            lambda path: write_tables(path, cls.make_near_solved_tables()),
+        )
+
+    @classmethod
+    def _use_near_solved_tables(cls, tables):
+        # kept as arrays, they are searched with numpy.searchsorted
+        cls.near_solved_keys = tables["near_solved_keys"]
+        cls.near_solved_moves = tables["near_solved_moves"]
+
+    @classmethod
+    def publish(
+        cls,
+        name=None,
+        flipslice_twist=False,
+        corner_edge8=False,
+        corner_twist=False,
+        near_solved=False,
+    ):
+        """
+        Copy the tables into a new shared memory segment, building the table
+        files first if necessary. Other processes use the segment in place of
+        the table files by calling Tables.attach, or by setting the
+        RUBIKSOLVER_TABLES_SEGMENT environment variable to its name before
+        the tables are first loaded.
+
+        The caller owns the segment and should call close and unlink on it
+        once every process using it has finished.
+
+        Parameters
+        ----------
+        name: str, optional
+            Name of the segment, one is generated by default.
+        flipslice_twist: bool, optional
+            Also publish the flipslice-twist pruning table.
+        corner_edge8: bool, optional
+            Also publish the corner-edge8 pruning table.
+        corner_twist: bool, optional
+            Also publish the corner pruning table of the optimal solver.
+        near_solved: bool, optional
+            Also publish the index of positions close to solved.
+
+        Returns
+        -------
+        multiprocessing.shared_memory.SharedMemory
+        """
+        tables = dict(cls._map_tables())
+        if flipslice_twist:
+            tables.update(cls._map_flipslice_twist_tables())
+        if corner_edge8:
+            tables.update(cls._map_corner_edge8_tables())
+        if corner_twist:
+            tables.update(cls._map_corner_twist_tables())
+        if near_solved:
+            tables.update(cls._map_near_solved_tables())
+        return publish_tables(name, tables)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Use the tables in the shared memory segment called name, written by
+        Tables.publish, in place of the table files. The optional pruning
+        tables are used too if they were published.
+        """
+        start = time.perf_counter()
+        tables = attach_tables(name)
+        LOAD_TIMES[f"shared memory {name}"] = time.perf_counter() - start
+        cls._use_tables(tables)
+        if "flipslice_twist_prune" in tables:
+            cls._use_flipslice_twist_tables(tables)
+        if "corner_edge8_prune" in tables:
+            cls._use_corner_edge8_tables(tables)
+        if "corner_twist_prune" in tables:
+            cls._use_corner_twist_tables(tables)
+        if "near_solved_keys" in tables:
+            cls._use_near_solved_tables(tables)
+
+    @classmethod
+    def build_tables(cls, tables_path, workers=None):
+        """
+        Write the table file, converting a tables.json written by older
+        versions of the solver if there is one, otherwise generating the
+        tables from scratch.
+        """
+        json_path = get_tables_path("tables.json")
+        if os.path.isfile(json_path):
+            convert_json_tables(json_path, tables_path)
+        else:
+            write_tables(tables_path, cls.make_tables(workers))
+
+    @classmethod
+    def make_tables(cls, workers=None):
+        """
+        Generate all move and pruning tables. Returns a dictionary of arrays
+        ready to be written to the table file.
+
+        The move tables are independent of each other and are built
+        concurrently in a pool of worker processes. The pruning tables are
+        then built concurrently once the move tables they depend on exist.
+
+        Parameters
+        ----------
+        workers: int, optional
+            Number of worker processes, defaults to the number of CPUs. With a
+            single worker the tables are built in the current process.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        with contextlib.ExitStack() as stack:
+            if workers > 1:
+                pool = stack.enter_context(ProcessPoolExecutor(workers))
+                submit = pool.submit
+            else:
+                submit = _submit_serial
+
+            # ----------  Move tables  ---------- #
+            futures = {
+                name: submit(builder)
+                for name, builder in cls.move_table_builders().items()
+            }
             tables = {
-                "twist_move": cls.twist_move,
-                "flip_move": cls.flip_move,
-                "udslice_move": cls.udslice_move,
-                "edge4_move": cls.edge4_move,
-                "edge8_move": cls.edge8_move,
-                "corner_move": cls.corner_move,
-                "udslice_twist_prune": cls.udslice_twist_prune.table,
-                "udslice_flip_prune": cls.udslice_flip_prune.table,
-                "edge4_edge8_prune": cls.edge4_edge8_prune.table,
-                "edge4_corner_prune": cls.edge4_corner_prune.table,
+                name: future.result() for name, future in futures.items()
             }
-            with open(tables_path, "w") as f:
-                json.dump(tables, f)
 
-        cls._tables_loaded = True
+            # ----------  Pruning tables  ---------- #
+            # move tables of the two coordinates, size of the second one
+            pruning = {
+                "udslice_twist_prune": (
+                    "udslice_move",
+                    "twist_move",
+                    cls.TWIST,
+                ),
+                "udslice_flip_prune": ("udslice_move", "flip_move", cls.FLIP),
+                "edge4_edge8_prune": ("edge4_move", "edge8_move", cls.EDGE8),
+                "edge4_corner_prune": (
+                    "edge4_move",
+                    "corner_move",
+                    cls.CORNER,
+                ),
+            }
+            futures = {
+                name: submit(prune_bfs, tables[move_a], tables[move_b], size_b)
+                for name, (move_a, move_b, size_b) in pruning.items()
+            }
+            tables.update(
+                (name, future.result()) for name, future in futures.items()
+            )
+
+        return _stored_tables(tables)
+
+    @classmethod
+    def move_table_builders(cls):
+        """
+        The functions generating each of the move tables, and the table
+        mapping u_edges and d_edges to edge8, by table name.
+        """
+        return {
+            "twist_move": cls.make_twist_table,
+            "flip_move": cls.make_flip_table,
+            "udslice_move": cls.make_udslice_table,
+            "edge4_move": cls.make_edge4_table,
+            "edge8_move": cls.make_edge8_table,
+            "corner_move": cls.make_corner_table,
+            "corner_full_move": cls.make_corner_full_table,
+            "udslice_sorted_move": cls.make_udslice_sorted_table,
+            "u_edges_move": cls.make_u_edges_table,
+            "d_edges_move": cls.make_d_edges_table,
+            "ud_edges_edge8": cls.make_ud_edges_edge8_table,
+        }
+
+    @classmethod
+    def make_flipslice_twist_tables(cls):
+        """
+        Generate the symmetry reduced flipslice-twist pruning table and the
+        tables needed to look positions up in it. Uses the move tables, which
+        must already be loaded.
+        """
+        twist_move = np.asarray(cls.twist_move).reshape(cls.TWIST, cls.MOVES)
+        flip_move = np.asarray(cls.flip_move).reshape(cls.FLIP, cls.MOVES)
+        udslice_move = np.asarray(cls.udslice_move).reshape(
+            cls.UDSLICE, cls.MOVES
+        )
+        twist_conj = symmetry.make_twist_conj()
+        classidx, sym, rep, selfsym = symmetry.make_classes(
+            symmetry.make_flipslice_conj()
+        )
+        rep_move = (
+            udslice_move[rep // cls.FLIP].astype(np.int64) * cls.FLIP
+            + flip_move[rep % cls.FLIP]
+        )
+        prune = symmetry.sym_prune_bfs(
+            rep_move,
+            classidx,
+            sym,
+            selfsym,
+            twist_move,
+            twist_conj,
+            range(cls.MOVES),
+        )
+        tables = {
+            "flipslice_classidx": classidx,
+            "flipslice_sym": sym,
+            "flipslice_rep": rep,
+            "twist_conj": twist_conj,
+            "flipslice_twist_prune": prune,
+        }
+        return _stored_tables(tables, FLIPSLICE_TWIST_DTYPES)
+
+    @classmethod
+    def make_corner_edge8_tables(cls):
+        """
+        Generate the symmetry reduced corner-edge8 pruning table and the
+        tables needed to look positions up in it. Uses the move tables, which
+        must already be loaded.
+        """
+        corner_move = np.asarray(cls.corner_move).reshape(
+            cls.CORNER, cls.MOVES
+        )
+        edge8_move = np.asarray(cls.edge8_move).reshape(cls.EDGE8, cls.MOVES)
+        edge8_conj = symmetry.make_edge8_conj()
+        classidx, sym, rep, selfsym = symmetry.make_classes(
+            symmetry.make_corner_conj()
+        )
+        prune = symmetry.sym_prune_bfs(
+            corner_move[rep],
+            classidx,
+            sym,
+            selfsym,
+            edge8_move,
+            edge8_conj,
+            PHASE_2_MOVES,
+        )
+        tables = {
+            "corner_classidx": classidx,
+            "corner_sym": sym,
+            "corner_rep": rep,
+            "edge8_conj": edge8_conj,
+            # about 1% of the entries are 16 to 18 moves away. Capping them
+            # at 15 keeps the table admissible and lets it be packed
+            "corner_edge8_prune": np.minimum(prune, 15),
+        }
+        return _stored_tables(tables, CORNER_EDGE8_DTYPES)
+
+    @classmethod
+    def make_corner_twist_tables(cls):
+        """
+        Generate the symmetry reduced corner pruning table of the optimal
+        solver and the tables needed to look positions up in it. Uses the
+        move tables, which must already be loaded.
+        """
+        corner_move = np.asarray(cls.corner_full_move).reshape(
+            cls.CORNER, cls.MOVES
+        )
+        twist_move = np.asarray(cls.twist_move).reshape(cls.TWIST, cls.MOVES)
+        twist_conj = symmetry.make_twist_conj()
+        classidx, sym, rep, selfsym = symmetry.make_classes(
+            symmetry.make_corner_conj()
+        )
+        prune = symmetry.sym_prune_bfs(
+            corner_move[rep],
+            classidx,
+            sym,
+            selfsym,
+            twist_move,
+            twist_conj,
+            range(cls.MOVES),
+        )
+        tables = {
+            "corner_classidx": classidx,
+            "corner_sym": sym,
+            "corner_rep": rep,
+            "twist_conj": twist_conj,
+            "corner_twist_prune": prune,
+        }
+        return _stored_tables(tables, CORNER_TWIST_DTYPES)
+
+    @classmethod
+    def make_near_solved_tables(cls):
+        """Generate the index of the positions close to solved."""
+        keys, moves = nearsolved.make_near_solved(cls.NEAR_SOLVED_DEPTH)
+        tables = {"near_solved_keys": keys, "near_solved_moves": moves}
+        return _stored_tables(tables, NEAR_SOLVED_DTYPES)
 
     @classmethod
     def make_twist_table(cls):
-        twist_move = [[0] * cls.MOVES for i in range(cls.TWIST)]
-        a = CubieCube()
-        for i in range(cls.TWIST):
-            a.twist = i
-            for j in range(6):
-                for k in range(3):
-                    a.corner_multiply(MOVE_CUBE[j])
-                    twist_move[i][3 * j + k] = a.twist
-                a.corner_multiply(MOVE_CUBE[j])
+        co = batch.decode_twist(np.arange(cls.TWIST))
+        twist_move = np.empty((cls.TWIST, cls.MOVES), dtype=np.int64)
+        for mv in range(cls.MOVES):
+            twist_move[:, mv] = batch.encode_twist(batch.move_co(co, mv))
         return twist_move
 
     @classmethod
     def make_flip_table(cls):
-        flip_move = [[0] * cls.MOVES for i in range(cls.FLIP)]
-        a = CubieCube()
-        for i in range(cls.FLIP):
-            a.flip = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    flip_move[i][3 * j + k] = a.flip
-                a.edge_multiply(MOVE_CUBE[j])
+        eo = batch.decode_flip(np.arange(cls.FLIP))
+        flip_move = np.empty((cls.FLIP, cls.MOVES), dtype=np.int64)
+        for mv in range(cls.MOVES):
+            flip_move[:, mv] = batch.encode_flip(batch.move_eo(eo, mv))
         return flip_move
 
     @classmethod
     def make_udslice_table(cls):
-        udslice_move = [[0] * cls.MOVES for i in range(cls.UDSLICE)]
-        a = CubieCube()
-        for i in range(cls.UDSLICE):
-            a.udslice = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    udslice_move[i][3 * j + k] = a.udslice
-                a.edge_multiply(MOVE_CUBE[j])
+        ep = batch.decode_udslice(np.arange(cls.UDSLICE))
+        udslice_move = np.empty((cls.UDSLICE, cls.MOVES), dtype=np.int64)
+        for mv in range(cls.MOVES):
+            udslice_move[:, mv] = batch.encode_udslice(batch.move_ep(ep, mv))
         return udslice_move
 
     @classmethod
     def make_edge4_table(cls):
-        edge4_move = [[0] * cls.MOVES for i in range(cls.EDGE4)]
-        a = CubieCube()
-        for i in range(cls.EDGE4):
-            a.edge4 = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    if k % 2 == 0 and j % 3 != 0:
-                        edge4_move[i][3 * j + k] = -1
-                    else:
-                        edge4_move[i][3 * j + k] = a.edge4
-                a.edge_multiply(MOVE_CUBE[j])
+        edge4_move = np.full((cls.EDGE4, cls.MOVES), -1, dtype=np.int64)
+        ep = np.hstack(
+            [
+                np.tile(np.arange(8), (cls.EDGE4, 1)),
+                batch.decode_perm(np.arange(cls.EDGE4), range(8, 12)),
+            ]
+        )
+        for mv in PHASE_2_MOVES:
+            edge4_move[:, mv] = batch.encode_perm(batch.move_ep(ep, mv)[:, 8:])
         return edge4_move
 
     @classmethod
     def make_edge8_table(cls):
-        edge8_move = [[0] * cls.MOVES for i in range(cls.EDGE8)]
-        a = CubieCube()
-        for i in range(cls.EDGE8):
-            a.edge8 = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    if k % 2 == 0 and j % 3 != 0:
-                        edge8_move[i][3 * j + k] = -1
-                    else:
-                        edge8_move[i][3 * j + k] = a.edge8
-                a.edge_multiply(MOVE_CUBE[j])
+        edge8_move = np.full((cls.EDGE8, cls.MOVES), -1, dtype=np.int64)
+        ep = np.hstack(
+            [
+                batch.decode_perm(np.arange(cls.EDGE8), range(8)),
+                np.tile(np.arange(8, 12), (cls.EDGE8, 1)),
+            ]
+        )
+        for mv in PHASE_2_MOVES:
+            edge8_move[:, mv] = batch.encode_perm(batch.move_ep(ep, mv)[:, :8])
         return edge8_move
 
     @classmethod
     def make_corner_table(cls):
-        corner_move = [[0] * cls.MOVES for i in range(cls.CORNER)]
-        a = CubieCube()
-        for i in range(cls.CORNER):
-            a.corner = i
-            for j in range(6):
-                for k in range(3):
-                    a.corner_multiply(MOVE_CUBE[j])
-                    if k % 2 == 0 and j % 3 != 0:
-                        corner_move[i][3 * j + k] = -1
-                    else:
-                        corner_move[i][3 * j + k] = a.corner
-                a.corner_multiply(MOVE_CUBE[j])
+        corner_move = np.full((cls.CORNER, cls.MOVES), -1, dtype=np.int64)
+        cp = batch.decode_perm(np.arange(cls.CORNER), range(8))
+        for mv in PHASE_2_MOVES:
+            corner_move[:, mv] = batch.encode_perm(batch.move_cp(cp, mv))
         return corner_move
 
     @classmethod
-    def make_udslice_twist_prune(cls):
-        udslice_twist_prune = [-1] * (cls.UDSLICE * cls.TWIST)
-        udslice_twist_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.UDSLICE * cls.TWIST:
-            for i in range(cls.UDSLICE * cls.TWIST):
-                if udslice_twist_prune[i] == depth:
-                    m = [
-                        cls.udslice_move[i // cls.TWIST][j] * cls.TWIST
-                        + cls.twist_move[i % cls.TWIST][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if udslice_twist_prune[x] == -1:
-                            count += 1
-                            udslice_twist_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(udslice_twist_prune, cls.TWIST)
-
-    @classmethod
-    def make_udslice_flip_prune(cls):
-        udslice_flip_prune = [-1] * (cls.UDSLICE * cls.FLIP)
-        udslice_flip_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.UDSLICE * cls.FLIP:
-            for i in range(cls.UDSLICE * cls.FLIP):
-                if udslice_flip_prune[i] == depth:
-                    m = [
-                        cls.udslice_move[i // cls.FLIP][j] * cls.FLIP
-                        + cls.flip_move[i % cls.FLIP][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if udslice_flip_prune[x] == -1:
-                            count += 1
-                            udslice_flip_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(udslice_flip_prune, cls.FLIP)
-
-    @classmethod
-    def make_edge4_edge8_prune(cls):
-        edge4_edge8_prune = [-1] * (cls.EDGE4 * cls.EDGE8)
-        edge4_edge8_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.EDGE4 * cls.EDGE8:
-            for i in range(cls.EDGE4 * cls.EDGE8):
-                if edge4_edge8_prune[i] == depth:
-                    m = [
-                        cls.edge4_move[i // cls.EDGE8][j] * cls.EDGE8
-                        + cls.edge8_move[i % cls.EDGE8][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if edge4_edge8_prune[x] == -1:
-                            count += 1
-                            edge4_edge8_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(edge4_edge8_prune, cls.EDGE8)
-
-    @classmethod
-    def make_edge4_corner_prune(cls):
-        edge4_corner_prune = [-1] * (cls.EDGE4 * cls.CORNER)
-        edge4_corner_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.EDGE4 * cls.CORNER:
-            for i in range(cls.EDGE4 * cls.CORNER):
-                if edge4_corner_prune[i] == depth:
-                    m = [
-                        cls.edge4_move[i // cls.CORNER][j] * cls.CORNER
-                        + cls.corner_move[i % cls.CORNER][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if edge4_corner_prune[x] == -1:
-                            count += 1
-                            edge4_corner_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(edge4_corner_prune, cls.CORNER)
+    def make_corner_full_table(cls):
+        """
+        Move table for the corner permutation under all 18 moves, so that it
+        can be followed through phase 1.
+        """
+        corner_full_move = np.empty((cls.CORNER, cls.MOVES), dtype=np.int64)
+        cp = batch.decode_perm(np.arange(cls.CORNER), range(8))
+        for mv in range(cls.MOVES):
+            corner_full_move[:, mv] = batch.encode_perm(batch.move_cp(cp, mv))
+        return corner_full_move
+
+    @classmethod
+    def _make_edge_positions_table(cls, edges):
+        """
+        Move table for the position and order of four edges, see
+        CubieCube._edge_positions.
+        """
+        size = cls.UDSLICE_SORTED
+        table = np.empty((size, cls.MOVES), dtype=np.int64)
+        ep = batch.decode_edge_positions(np.arange(size), edges)
+        for mv in range(cls.MOVES):
+            table[:, mv] = batch.encode_edge_positions(
+                batch.move_ep(ep, mv), edges
+            )
+        return table
+
+    @classmethod
+    def make_udslice_sorted_table(cls):
+        return cls._make_edge_positions_table(range(8, 12))
+
+    @classmethod
+    def make_u_edges_table(cls):
+        return cls._make_edge_positions_table(range(4))
+
+    @classmethod
+    def make_d_edges_table(cls):
+        return cls._make_edge_positions_table(range(4, 8))
+
+    @classmethod
+    def make_ud_edges_edge8_table(cls):
+        """
+        Table giving the edge8 of a phase 2 position from its u_edges and the
+        order of its D edges, d_edges % 24. In phase 2 the D edges fill the
+        positions among the first 8 not taken by the U edges. Entries for
+        values of u_edges that don't occur in phase 2 are -1.
+        """
+        table = np.full((cls.U_EDGES, 24), -1, dtype=np.int64)
+        ep = batch.decode_edge_positions(np.arange(cls.U_EDGES), range(4))
+        u_member = ep < 4
+        phase_2 = ~u_member[:, 8:].any(axis=1)
+        u_edges = np.flatnonzero(phase_2)
+        for order in range(24):
+            d_edges = batch.decode_perm(
+                np.full(len(u_edges), order), range(4, 8)
+            )
+            perm = ep[u_edges, :8].copy()
+            perm[~u_member[u_edges, :8]] = d_edges.ravel()
+            table[u_edges, order] = batch.encode_perm(perm)
+        return table